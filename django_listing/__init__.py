@@ -13,9 +13,26 @@ __status__ = "Beta"
 
 import re
 
-EXPORT_FORMATS = ["CSV", "DBF", "HTML", "JSON", "ODS", "TSV", "XLS", "XLSX", "YAML"]
-EXPORT_FORMATS_KEEP_ORIGINAL_TYPE = ["XLSX", "JSON", "XLS", "DBF"]
-EXPORT_FORMATS_USE_COL_NAME = ["JSON"]
+EXPORT_FORMATS = [
+    "CSV",
+    "DBF",
+    "HTML",
+    "JSON",
+    "JSONL",
+    "ODS",
+    "TSV",
+    "XLS",
+    "XLSX",
+    "YAML",
+]
+EXPORT_FORMATS_KEEP_ORIGINAL_TYPE = ["XLSX", "JSON", "JSONL", "XLS", "DBF"]
+EXPORT_FORMATS_USE_COL_NAME = ["JSON", "JSONL"]
+# formats that can be sent row by row without building the whole file in memory
+EXPORT_FORMATS_STREAMING = {
+    "CSV": "text/csv",
+    "JSONL": "application/x-ndjson",
+    "TSV": "text/tab-separated-values",
+}
 EXPORT_EXCEL_SANITIZE_RE = re.compile(r"[\000-\010]|[\013-\014]|[\016-\037]")
 FILTER_QUERYSTRING_PREFIX = "f_"
 
@@ -32,3 +49,7 @@ from .aggregations import *
 from .attached_form import *
 from .actions_buttons_column import *
 from .charts import *
+from .instrumentation import *
+from .render_cache import *
+from .sequence_engines import *
+from .url_builder import *
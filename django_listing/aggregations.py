@@ -3,8 +3,12 @@
 #
 # @author: Eric Lapouyade
 #
+import hashlib
+import math
+import random
+import statistics
 
-from django.db.models import Avg, Max, Min, Sum
+from django.db.models import Avg, Count, Max, Min, StdDev, Sum
 from django.db.models.query import QuerySet
 from django.utils.translation import gettext
 from django.utils.translation import gettext_lazy as _
@@ -15,12 +19,52 @@ __all__ = [
     "Aggregation",
     "AggregationMeta",
     "AvgAggregation",
+    "CountDistinctAggregation",
+    "HyperLogLog",
     "MaxAggregation",
+    "MedianAggregation",
     "MinAggregation",
+    "StdDevAggregation",
     "SumAggregation",
 ]
 
 
+def is_numeric(value):
+    return isinstance(value, (int, float))
+
+
+class HyperLogLog:
+    """Estimate the number of distinct values with 2**precision registers
+
+    The standard error is about 1.04 / sqrt(2**precision) : 1.6% with the
+    default precision, whatever the number of values added.
+    """
+
+    def __init__(self, precision=12):
+        self.precision = precision
+        self.nb_registers = 1 << precision
+        self.registers = bytearray(self.nb_registers)
+
+    def add(self, value):
+        digest = hashlib.blake2b(repr(value).encode(), digest_size=8).digest()
+        hashed = int.from_bytes(digest, "big")
+        bits = 64 - self.precision
+        index = hashed >> bits
+        rank = bits - (hashed & ((1 << bits) - 1)).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def count(self):
+        m = self.nb_registers
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0**-r for r in self.registers)
+        zeros = self.registers.count(0)
+        if zeros and estimate <= 2.5 * m:
+            # small range correction (linear counting)
+            estimate = m * math.log(m / zeros)
+        return round(estimate)
+
+
 class AggregationMeta(type):
     slug2class = {}
 
@@ -58,9 +102,12 @@ class Aggregation(metaclass=AggregationMeta):
     footer_tpl = None
     value_tpl = "{value}"
     params_keys = None
+    # keep the aggregated values in self.values like before running statistics,
+    # for custom aggregations still using values or get_numeric_values()
+    keep_values = False
 
     def __init__(self, column, global_aggregation=False):
-        self.values = []
+        self.reset()
         self.column = column
         self.global_aggregation = global_aggregation
         if self.params_keys:
@@ -71,13 +118,64 @@ class Aggregation(metaclass=AggregationMeta):
                 if not hasattr(column, p):
                     setattr(column, p, getattr(self, p))
 
+    def reset(self):
+        """Running statistics : values are not kept in memory unless keep_values"""
+        self._values = [] if self.keep_values else None
+        self.nb_values = 0
+        self.count = 0  # numeric values
+        self.sum = 0
+        self.min = None
+        self.max = None
+        self.mean = 0.0  # Welford algorithm for variance
+        self.m2 = 0.0
+
+    def add_value(self, value):
+        self.nb_values += 1
+        if self._values is not None:
+            self._values.append(value)
+        if not is_numeric(value):
+            return
+        self.count += 1
+        self.sum += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    @property
+    def values(self):
+        """Deprecated : aggregated values, available with keep_values or once set"""
+        if self._values is None:
+            raise InvalidAggregation(
+                f"{self.__class__.__name__} does not keep the aggregated values : "
+                "set keep_values = True to use values or get_numeric_values()"
+            )
+        return self._values
+
+    @values.setter
+    def values(self, values):
+        """Deprecated : replace the aggregated values, running statistics too"""
+        self.reset()
+        self._values = []
+        for value in values:
+            self.add_value(value)
+
     def get_numeric_values(self):
-        return [v for v in self.values if isinstance(v, (int, float))]
+        """Deprecated : use the running statistics (count, sum, min, max...)"""
+        return [v for v in self.values if is_numeric(v)]
+
+    def get_avg(self):
+        return self.sum / self.count if self.count else None
+
+    def get_stddev(self):
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else None
 
     def aggregate(self, rec):
         if not self.global_aggregation:
-            value = self.column.get_cell_value(rec)
-            self.values.append(value)
+            self.add_value(self.column.get_cell_value(rec))
 
     def get_footer_attrs(self, ctx, value):
         attrs = self.column.get_footer_attrs(ctx, value)
@@ -108,7 +206,7 @@ class Aggregation(metaclass=AggregationMeta):
         return "<td{attrs}>%s</td>" % self.get_footer_value_tpl(ctx, value)
 
     def render_footer(self):
-        if self.values or self.global_aggregation:
+        if self.nb_values or self.global_aggregation:
             value = self.get_aggregated_value()
             ctx = self.get_footer_context(value)
             ctx.attrs = self.get_footer_attrs(ctx, value)
@@ -121,15 +219,38 @@ class Aggregation(metaclass=AggregationMeta):
             return self.column.default_footer_value
 
     def get_aggregated_value_from_sequence(self, seq):
-        records = self.column.listing.records.get_all()
-        self.values = [self.column.get_cell_value(rec) for rec in records]
+        self.reset()
+        for rec in self.column.listing.records.iter_all():
+            self.add_value(self.column.get_cell_value(rec))
         return self.get_aggregated_value_from_current_page()
 
+    def get_queryset_aggregates(self):
+        """Expressions to give to QuerySet.aggregate() for global aggregation
+
+        All global aggregations of a listing are computed in one query
+        (see RecordManager.get_global_aggregates()). Return None to compute
+        it in get_aggregated_value_from_queryset() instead.
+        """
+        return None
+
+    def get_aggregated_value_from_aggregates(self, aggregates):
+        return aggregates.get("val")
+
+    def get_aggregated_value_from_queryset(self, qs):
+        return self.get_aggregated_value_from_aggregates(
+            qs.aggregate(**self.get_queryset_aggregates())
+        )
+
     def get_aggregated_value(self):
         listing = self.column.listing
         if self.global_aggregation:
             data = listing.data
             if isinstance(data, QuerySet):
+                aggregates = listing.records.get_global_aggregates().get(
+                    self.column.name
+                )
+                if aggregates is not None:
+                    return self.get_aggregated_value_from_aggregates(aggregates)
                 data = listing.records.get_filtered_queryset()
                 return self.get_aggregated_value_from_queryset(data)
             else:
@@ -142,46 +263,46 @@ class SumAggregation(Aggregation):
     value_tpl = _("Total :<br>{value}")
 
     def get_aggregated_value_from_current_page(self):
-        return sum(self.get_numeric_values())
+        return self.sum
 
-    def get_aggregated_value_from_queryset(self, qs):
-        return qs.aggregate(val=Sum(self.column.data_key)).get("val")
+    def get_queryset_aggregates(self):
+        return dict(val=Sum(self.column.data_key))
 
 
 class MinAggregation(Aggregation):
     value_tpl = _("Min :<br>{value}")
 
     def get_aggregated_value_from_current_page(self):
-        return min(self.get_numeric_values())
+        return self.min
 
-    def get_aggregated_value_from_queryset(self, qs):
-        return qs.aggregate(val=Min(self.column.data_key)).get("val")
+    def get_queryset_aggregates(self):
+        return dict(val=Min(self.column.data_key))
 
 
 class MaxAggregation(Aggregation):
     value_tpl = _("Max :<br>{value}")
 
     def get_aggregated_value_from_current_page(self):
-        return max(self.get_numeric_values())
+        return self.max
 
-    def get_aggregated_value_from_queryset(self, qs):
-        return qs.aggregate(val=Max(self.column.data_key)).get("val")
+    def get_queryset_aggregates(self):
+        return dict(val=Max(self.column.data_key))
 
 
 class MinMaxAggregation(Aggregation):
     value_tpl = _("Min : {min_val}<br>Max : {max_val}")
 
     def get_aggregated_value_from_current_page(self):
-        return dict(
-            min_val=min(self.get_numeric_values()),
-            max_val=max(self.get_numeric_values()),
-        )
+        return dict(min_val=self.min, max_val=self.max)
 
-    def get_aggregated_value_from_queryset(self, qs):
-        return qs.aggregate(
+    def get_queryset_aggregates(self):
+        return dict(
             min_val=Min(self.column.data_key), max_val=Max(self.column.data_key)
         )
 
+    def get_aggregated_value_from_aggregates(self, aggregates):
+        return aggregates
+
 
 class MinMaxAvgAggregation(Aggregation):
     value_tpl = _(
@@ -192,20 +313,18 @@ class MinMaxAvgAggregation(Aggregation):
     footer_precision = 2
 
     def get_aggregated_value_from_current_page(self):
-        num_values = self.get_numeric_values()
-        return dict(
-            min_val=min(num_values),
-            max_val=max(num_values),
-            avg_val=sum(num_values) / len(num_values),
-        )
+        return dict(min_val=self.min, max_val=self.max, avg_val=self.get_avg())
 
-    def get_aggregated_value_from_queryset(self, qs):
-        return qs.aggregate(
+    def get_queryset_aggregates(self):
+        return dict(
             min_val=Min(self.column.data_key),
             max_val=Max(self.column.data_key),
             avg_val=Avg(self.column.data_key),
         )
 
+    def get_aggregated_value_from_aggregates(self, aggregates):
+        return aggregates
+
 
 class AvgAggregation(Aggregation):
     value_tpl = "Average :<br>{value:.{col.footer_precision}f}"
@@ -213,8 +332,96 @@ class AvgAggregation(Aggregation):
     footer_precision = 2
 
     def get_aggregated_value_from_current_page(self):
-        num_values = self.get_numeric_values()
-        return sum(num_values) / len(num_values)
+        return self.get_avg()
+
+    def get_queryset_aggregates(self):
+        return dict(val=Avg(self.column.data_key))
+
+
+class StdDevAggregation(Aggregation):
+    value_tpl = "Std dev :<br>{value:.{col.footer_precision}f}"
+    params_keys = "footer_precision"
+    footer_precision = 2
+
+    def get_aggregated_value_from_current_page(self):
+        return self.get_stddev()
+
+    def get_queryset_aggregates(self):
+        return dict(val=StdDev(self.column.data_key, sample=True))
+
+
+class MedianAggregation(Aggregation):
+    """Median on a uniform sample of sample_size values (reservoir sampling)
+
+    The median is exact when there are less than sample_size values.
+    """
+
+    value_tpl = _("Median :<br>{value}")
+    sample_size = 10000
+
+    def reset(self):
+        super().reset()
+        self.sample = []
+        self.random = random.Random(0)  # same sample for same data
+
+    def add_value(self, value):
+        super().add_value(value)
+        if not is_numeric(value):
+            return
+        if len(self.sample) < self.sample_size:
+            self.sample.append(value)
+        else:
+            i = self.random.randrange(self.count)
+            if i < self.sample_size:
+                self.sample[i] = value
+
+    def get_aggregated_value_from_current_page(self):
+        return statistics.median(self.sample) if self.sample else None
 
     def get_aggregated_value_from_queryset(self, qs):
-        return qs.aggregate(val=Avg(self.column.data_key)).get("val")
+        self.reset()
+        values = qs.values_list(self.column.data_key, flat=True)
+        for value in values.iterator(chunk_size=self.column.listing.export_chunk_size):
+            self.add_value(value)
+        return self.get_aggregated_value_from_current_page()
+
+
+class CountDistinctAggregation(Aggregation):
+    """Number of distinct non-null values
+
+    Values are counted exactly up to exact_max distinct values, then a
+    HyperLogLog estimation is used to keep memory bounded.
+    """
+
+    value_tpl = _("Distinct :<br>{value}")
+    exact_max = 10000
+
+    def reset(self):
+        super().reset()
+        self.distinct_values = set()
+        self.hyperloglog = None
+
+    def add_value(self, value):
+        super().add_value(value)
+        if value is None:
+            return
+        if self.hyperloglog is not None:
+            self.hyperloglog.add(value)
+            return
+        try:
+            self.distinct_values.add(value)
+        except TypeError:  # unhashable
+            self.distinct_values.add(repr(value))
+        if len(self.distinct_values) > self.exact_max:
+            self.hyperloglog = HyperLogLog()
+            for distinct_value in self.distinct_values:
+                self.hyperloglog.add(distinct_value)
+            self.distinct_values = set()
+
+    def get_aggregated_value_from_current_page(self):
+        if self.hyperloglog is not None:
+            return self.hyperloglog.count()
+        return len(self.distinct_values)
+
+    def get_queryset_aggregates(self):
+        return dict(val=Count(self.column.data_key, distinct=True))
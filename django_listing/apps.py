@@ -72,15 +72,40 @@ class DjangoListingConfig(AppConfig):
     CHARTS_DEFAULT_GRADIENT_OVERFLOW = "#CCCCCC"
     CHARTS_DEFAULT_TREND_BAR_COLOR = "#888888"
 
+    # Background exports (see Listing.export_in_background)
+    # EXPORT_JOB_BACKEND : class path or class derivated from ExportJobBackend
+    EXPORT_JOB_BACKEND = "django_listing.export_jobs.ThreadExportJobBackend"
+    EXPORT_JOB_MAX_WORKERS = 2
+    # EXPORT_JOB_CACHE : use a shared cache if there are many web worker processes
+    EXPORT_JOB_CACHE = "default"
+    # EXPORT_JOB_DIR : where export files are written, None for system temp dir
+    EXPORT_JOB_DIR = None
+    EXPORT_JOB_TIMEOUT = 3600  # seconds to keep job state in cache
+    # QUERY_BUDGET_RAISE : raise QueryBudgetExceeded instead of logging a warning
+    # when a listing does more queries than its max_queries attribute
+    QUERY_BUDGET_RAISE = False
+    # RENDER_CACHE : django cache name for rendered listings (see Listing.render_cache)
+    RENDER_CACHE = "default"
+    # FILTERS_CHOICES_CACHE : django cache name for foreign key filters choices
+    FILTERS_CHOICES_CACHE = "default"
+    FILTERS_CHOICES_TIMEOUT = 3600
+    # FILTERS_FORM_CLASSES_CACHE_SIZE : filters form classes kept (see
+    # Filters.cache_form_class)
+    FILTERS_FORM_CLASSES_CACHE_SIZE = 256
+    # CONCURRENT_LISTINGS_MAX_WORKERS : threads fetching data of listings views
+    # having concurrent_listings = True
+    CONCURRENT_LISTINGS_MAX_WORKERS = 8
+    # SEQUENCE_CACHE_SIZE : sequence data kept ingested (see Listing.sequence_cache)
+    SEQUENCE_CACHE_SIZE = 16
+    # SEQUENCE_INDICES_CACHE_SIZE : filtered/sorted indices kept per sequence data
+    SEQUENCE_INDICES_CACHE_SIZE = 32
+
     def ready(self):
         import time
 
         from django.conf import settings
 
         from django_listing import __version__
-        from django_listing.theme_config import ThemeConfigBase, ThemeConfigMeta
-
-        from .exceptions import InvalidListingConfiguration
 
         if hasattr(settings, "DJANGO_LISTING"):
             for k, v in settings.DJANGO_LISTING.items():
@@ -90,21 +115,44 @@ class DjangoListingConfig(AppConfig):
                     else:
                         setattr(self, k, v)
         self.context = {k: getattr(self, k) for k in dir(self) if k.isupper()}
-        if isinstance(self.THEME, str):
-            self.theme_config = ThemeConfigMeta.get_class(self.THEME)
-        elif issubclass(self.THEME, ThemeConfigBase):
-            self.theme_config = self.THEME
-        else:
-            raise InvalidListingConfiguration(
-                "THEME parameter must contain either a string "
-                "either a class derivated from ThemeConfigBase"
-            )
         STATIC_FILES_VERSION = __version__
         if settings.DEBUG:
             STATIC_FILES_VERSION += f"_{time.perf_counter()}"
         self.context.update(
-            theme_config=self.theme_config,
             STATIC_URL=settings.STATIC_URL,
             STATIC_FILES_VERSION=STATIC_FILES_VERSION,
         )
         settings.django_listing_settings = self
+        self.set_theme(self.THEME)
+
+    def set_theme(self, theme, reload=False):
+        """Select the theme (name or ThemeConfigBase subclass)
+
+        Theme attributes and templates paths are resolved once per theme,
+        use reload=True if the theme config or its templates have changed.
+        """
+        from django_listing.theme_config import (
+            ThemeConfigBase,
+            ThemeConfigMeta,
+            get_theme_resolution,
+        )
+
+        from .exceptions import InvalidListingConfiguration
+
+        if isinstance(theme, str):
+            theme_config = ThemeConfigMeta.get_class(theme)
+        elif isinstance(theme, type) and issubclass(theme, ThemeConfigBase):
+            theme_config = theme
+        else:
+            raise InvalidListingConfiguration(
+                "THEME parameter must contain either a string "
+                "either a class derivated from ThemeConfigBase"
+            )
+        self.theme_resolution = get_theme_resolution(theme_config, reload=reload)
+        self.theme_config = theme_config
+        # THEME is also a part of rendered listings cache keys
+        self.THEME = theme
+        self.context.update(THEME=theme, theme_config=theme_config)
+
+    def reload_theme(self):
+        self.set_theme(self.THEME, reload=True)
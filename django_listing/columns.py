@@ -30,10 +30,10 @@ from django.utils.translation import gettext_lazy as _
 
 from django_listing import FILTER_QUERYSTRING_PREFIX
 from .aggregations import Aggregation, AggregationMeta
-from .context import RenderContext
+from .context import LazyRenderContext, RenderContext
 from .exceptions import *
 from .html_attributes import HTMLAttributes
-from .record import cache_in_record
+from .record import cache_in_record, get_record_accessor
 from .theme_config import ThemeAttribute
 from .utils import init_dicts_from_class
 
@@ -192,6 +192,59 @@ FORM_FIELD_BASE_KEYS = {
 
 EXPORT_XLSX_ILLEGAL_CHARACTERS_RE = re.compile(r"[\000-\010]|[\013-\014]|[\016-\037]")
 
+# Request independent model introspection, computed once per process
+model_fields_cache = {}
+model_columns_fields_cache = {}
+model_column_classes_cache = {}
+
+
+def get_model_field(model, data_key):
+    """(model field, form field) of a column data_key or None if not a field
+
+    The form field is shared by all the columns using this data_key :
+    it must only be read.
+    """
+    key = (model, data_key)
+    if key in model_fields_cache:
+        return model_fields_cache[key]
+    try:
+        if "__" in data_key:
+            attr, foreign_attr = data_key.split("__", maxsplit=1)
+            f = model._meta.get_field(attr)
+            f = f.related_model._meta.get_field(foreign_attr)
+        else:
+            f = model._meta.get_field(data_key)
+    except FieldDoesNotExist:
+        model_field = None
+    else:
+        form_field = None
+        if hasattr(f, "formfield"):
+            form_field = f.formfield(validators=f.validators)
+        model_field = (f, form_field)
+    model_fields_cache[key] = model_field
+    return model_field
+
+
+def get_model_columns_fields(model):
+    """(field, is reverse relation, default header) for ModelColumns"""
+    fields = model_columns_fields_cache.get(model)
+    if fields is None:
+        fields = []
+        for f in model._meta.get_fields():
+            # If using django-modeltranslation, do not consider localized fields
+            if hasattr(f, "translated_field"):
+                continue
+            if getattr(f, "related_model", None):
+                header = getattr(f, "verbose_name", None)
+                if not header:
+                    header = f.related_model._meta.verbose_name
+            else:
+                header = getattr(f, "verbose_name", f.name.capitalize())
+            is_reverse_rel = isinstance(f, (models.ManyToManyRel, models.ManyToOneRel))
+            fields.append((f, is_reverse_rel, header))
+        model_columns_fields_cache[model] = fields
+    return fields
+
 
 class ListingMethodRef:
     """Helper to reference a Listing method in column.cell_value instead of a lambda"""
@@ -390,21 +443,9 @@ class ModelColumns(Columns):
             else:
                 select_columns = self.listing.select_columns or []
 
-        for f in self.model._meta.get_fields():
-            if f.name in select_columns or not isinstance(
-                f, (models.ManyToManyRel, models.ManyToOneRel)
-            ):
-                # If using django-modeltranslation, do not consider localized fields
-                if hasattr(f, "translated_field"):
-                    continue
-                if not hasattr(self.listing, f"{f.name}__header"):
-                    if getattr(f, "related_model", None):
-                        header = getattr(f, "verbose_name", None)
-                        if not header:
-                            header = f.related_model._meta.verbose_name
-                    else:
-                        header = getattr(f, "verbose_name", f.name.capitalize())
-                else:
+        for f, is_reverse_rel, header in get_model_columns_fields(self.model):
+            if f.name in select_columns or not is_reverse_rel:
+                if hasattr(self.listing, f"{f.name}__header"):
                     header = getattr(self.listing, f"{f.name}__header")
                 col_class = getattr(self.listing, f"{f.name}__column_class", None)
                 if col_class and not issubclass(col_class, Column):
@@ -472,11 +513,23 @@ class ModelColumns(Columns):
     @classmethod
     def create_column(cls, field, **kwargs):
         field_name = field.name
+        # remember which column class accepted the field, new column classes
+        # may be declared later
+        key = (field, len(ColumnMeta.column_classes))
+        col_class = model_column_classes_cache.get(key)
+        if col_class is not None and col_class is not Column:
+            col = col_class.from_model_field(field, **kwargs)
+            if col:
+                return col
+        elif col_class is Column:
+            return Column(field_name, model_field=field, **kwargs)
         for col_class in ColumnMeta.get_column_classes():
             if col_class is not Column:
                 col = col_class.from_model_field(field, **kwargs)
                 if col:
+                    model_column_classes_cache[key] = col_class
                     return col
+        model_column_classes_cache[key] = Column
         return Column(field_name, model_field=field, **kwargs)
 
 
@@ -564,8 +617,11 @@ class Column(metaclass=ColumnMeta):
     ascending_by_default = True
     attached_filter = None
     can_edit = False
+    cell_attrs_cache = None  # see compile_render_plan()
+    cell_context_is_lazy = False  # see compile_render_plan()
     cell_tpl = None
     cell_edit_tpl = None
+    cell_value_index = None  # position in listing columns, for records cache
     cell_value = None
     cell_with_filter_link = None
     cell_with_filter_name = None
@@ -576,6 +632,9 @@ class Column(metaclass=ColumnMeta):
         'class="cell-filter {col.theme_cell_with_filter_icon}">'
         "</a></span></td>"
     )
+    data_accessor = None  # see compile_render_plan()
+    # True when get_cell_exported_value() does not use get_cell_value() override
+    exported_from_raw_value = False
     data_key = None
     default_footer_value = ""
     default_value = "-"
@@ -684,18 +743,12 @@ class Column(metaclass=ColumnMeta):
         if isinstance(self.data_key, str):
             self.data_key = self.data_key.replace(".", "__")
         if listing.model:
-            try:
-                if "__" in self.data_key:
-                    attr, foreign_attr = self.data_key.split("__", maxsplit=1)
-                    f = listing.model._meta.get_field(attr)
-                    f = f.related_model._meta.get_field(foreign_attr)
-                else:
-                    f = listing.model._meta.get_field(self.data_key)
+            model_field = get_model_field(listing.model, self.data_key)
+            if model_field:
+                f, form_field = model_field
                 self.model_field = f
                 if hasattr(f, "formfield"):
-                    self.model_form_field = f.formfield(validators=f.validators)
-            except FieldDoesNotExist:
-                pass
+                    self.model_form_field = form_field
         if self.sort_key is None:
             if isinstance(self.data_key, str):
                 self.sort_key = self.data_key.replace(".", "__")
@@ -727,7 +780,25 @@ class Column(metaclass=ColumnMeta):
             self.theme_button_class = set(self.theme_button_class.split())
 
     def render_init(self):
-        pass
+        self.compile_render_plan()
+
+    def compile_render_plan(self):
+        """
+        Prepare what can be computed once for all the cells of the column :
+        the data_key is compiled into a record accessor, cell attributes only
+        depend on the value type when they are not given by a callable, and the
+        cell context does not need to copy the global and record contexts when
+        no callable may read it : only the keys referenced by the templates are
+        then looked up (see LazyRenderContext).
+        """
+        self.data_accessor = get_record_accessor(self.data_key)
+        static_attrs = not callable(self.cell_attrs)
+        self.cell_attrs_cache = {} if static_attrs else None
+        self.cell_context_is_lazy = (
+            static_attrs
+            and not callable(self.value_tpl)
+            and not callable(self.cell_with_filter_link)
+        )
 
     def render_init_context(self, context):
         pass
@@ -759,16 +830,9 @@ class Column(metaclass=ColumnMeta):
         for k, v in self.listing.columns.get_params().get(self.name, {}).items():
             if k in keys:
                 setattr(self, k, v)
-        col_class_slug = self.__class__.__name__.lower()
-        for k in keys:
-            column_key = "columns_{}".format(k)
-            if hasattr(self.listing, column_key):
-                setattr(self, k, getattr(self.listing, column_key))
-            # It is possible to prefix with the column class in lower + "s"
-            # example : booleancolumns_reverse_form_label_tag = True
-            column_key = "{}s_{}".format(col_class_slug, k)
-            if hasattr(self.listing, column_key):
-                setattr(self, k, getattr(self.listing, column_key))
+        # columns_<param> and <col class in lower>s_<param> listing attributes
+        for k, column_key in self.listing.get_columns_params_attrs(self.__class__):
+            setattr(self, k, getattr(self.listing, column_key))
         # col__param has higher priority than columns_param,
         # so getting col__params AFTER columns_params
         for k, v in kwargs.items():
@@ -776,11 +840,8 @@ class Column(metaclass=ColumnMeta):
                 setattr(self, k, v)
         # DO NOT swap with above for-loop, otherwise <col>__choices won't work
         # See showcase BoolChoicesImgColumnsListing "gender" column
-        for k in dir(self.listing):
-            start_key = f"{self.name}__"
-            if k.startswith(start_key):
-                v = getattr(self.listing, k)
-                setattr(self, k[len(start_key) :], v)
+        for k, listing_attr in self.listing.get_column_overrides(self.name).items():
+            setattr(self, k, getattr(self.listing, listing_attr))
 
     def apply_template_kwargs(self):
         kwargs = self.listing.get_column_kwargs(self.name)
@@ -800,6 +861,17 @@ class Column(metaclass=ColumnMeta):
             return cls(field.name, model_field=field, **kwargs)
 
     def get_cell_attrs(self, rec, ctx, value):
+        if self.cell_attrs_cache is not None:
+            value_type = type(value)
+            attrs = self.cell_attrs_cache.get(value_type)
+            if attrs is None:
+                attrs = self.cell_attrs_cache[value_type] = self.build_cell_attrs(
+                    rec, ctx, value
+                )
+            return attrs.copy()
+        return self.build_cell_attrs(rec, ctx, value)
+
+    def build_cell_attrs(self, rec, ctx, value):
         cell_attrs = self.cell_attrs
         if callable(cell_attrs):
             cell_attrs = cell_attrs(rec, ctx, value)
@@ -834,10 +906,9 @@ class Column(metaclass=ColumnMeta):
                 only_one_with_prefix = (
                     FILTER_QUERYSTRING_PREFIX if self.has_cell_filter_single else None
                 )
-                return listing.get_url(
-                    only_one_with_prefix=only_one_with_prefix,
-                    **{filter_obj.input_name: rec_val},
-                )
+                return listing.get_url_pattern(
+                    filter_obj.input_name, only_one_with_prefix=only_one_with_prefix
+                ).format(rec_val)
         return None
 
     def get_default_value(self, rec):
@@ -857,7 +928,8 @@ class Column(metaclass=ColumnMeta):
             # listing, column, record. This is because self.cell_value has been
             # bound to listing object at initialization time.
         else:
-            value = rec.get(self.data_key)
+            accessor = self.data_accessor or get_record_accessor(self.data_key)
+            value = rec.get_by_accessor(accessor)
             if value is None:
                 value = self.get_default_value(rec)
         if hasattr(self, "choices") and not self.use_raw_value:
@@ -869,7 +941,48 @@ class Column(metaclass=ColumnMeta):
         return value
 
     def get_cell_exported_value(self, rec, keep_original_type=True):
-        val = self.get_cell_value(rec)
+        if self.exported_from_raw_value:
+            value = Column.get_cell_value(self, rec)
+        else:
+            value = self.get_cell_value(rec)
+        return self.get_exported_value(value, keep_original_type)
+
+    def get_db_value_exporter(self, keep_original_type=True):
+        """
+        Returns a function giving the exported value from the data_key value
+        read in database, or None if get_cell_exported_value() needs the record
+        (the column computes its value). See Listing.exported_rows().
+        """
+        col_class = type(self)
+        if (
+            self.cell_value is not None
+            or col_class.get_cell_exported_value is not Column.get_cell_exported_value
+            or col_class.get_default_value is not Column.get_default_value
+            or (
+                not self.exported_from_raw_value
+                and col_class.get_cell_value is not Column.get_cell_value
+            )
+        ):
+            return None
+        default_value = self.default_value
+        choices = (
+            self.choices
+            if hasattr(self, "choices") and not self.use_raw_value
+            else None
+        )
+        get_exported_value = self.get_exported_value
+
+        def exporter(value):
+            # same as get_cell_value() when cell_value is not set
+            if value is None:
+                value = default_value
+            if choices is not None:
+                value = choices.get(value, value)
+            return get_exported_value(value, keep_original_type)
+
+        return exporter
+
+    def get_exported_value(self, val, keep_original_type=True):
         if isinstance(val, str):
             val = strip_tags(val)
             if self.listing.export == "XLSX":
@@ -910,6 +1023,15 @@ class Column(metaclass=ColumnMeta):
     def get_cell_context(self, rec, value):
         if isinstance(value, str):
             value = conditional_escape(value)
+        if self.cell_context_is_lazy:
+            return LazyRenderContext(
+                (rec.get_format_ctx(), self.listing.global_context),
+                value,  # if value is a dict it will be merged (see RenderContext)
+                value=value,
+                rec=rec,
+                listing=self.listing,
+                col=self,
+            )
         ctx = RenderContext(
             self.listing.global_context,
             rec.get_format_ctx(),
@@ -956,7 +1078,7 @@ class Column(metaclass=ColumnMeta):
             ctx.filter_link = self.get_cell_filter_link(rec, ctx, value)
         tpl = self.get_cell_template(rec, ctx, value)
         try:
-            return tpl.format(**ctx)
+            return tpl.format_map(ctx)
         except (ValueError, AttributeError, IndexError) as e:
             return '<td class="render-error">{}</td>'.format(e)
 
@@ -1470,7 +1592,9 @@ class ManyColumn(Column):
             filter_name = self.cell_with_filter_name or self.name
             filter_obj = filters.get(filter_name)
             if filter_obj:
-                filter_link = listing.get_url(**{filter_obj.input_name: value.pk})
+                filter_link = listing.get_url_pattern(filter_obj.input_name).format(
+                    value.pk
+                )
                 out += (
                     f'<a href="{filter_link}" '
                     f'class="cell-filter {self.theme_cell_with_filter_icon}"></a>'
@@ -1576,8 +1700,9 @@ class DateColumn(Column):
             return formats.date_format(value, self.date_format)
         return value
 
-    def get_cell_exported_value(self, rec, keep_original_type=True):
-        value = super().get_cell_value(rec)
+    exported_from_raw_value = True
+
+    def get_exported_value(self, value, keep_original_type=True):
         if isinstance(value, datetime.datetime):
             value = value.date()
         return value
@@ -1600,8 +1725,9 @@ class DateTimeColumn(Column):
             return formats.date_format(value, self.datetime_format)
         return value
 
-    def get_cell_exported_value(self, rec, keep_original_type=True):
-        value = super().get_cell_value(rec)
+    exported_from_raw_value = True
+
+    def get_exported_value(self, value, keep_original_type=True):
         if isinstance(value, datetime.date):
             if keep_original_type:
                 value = value.replace(tzinfo=None)
@@ -1624,8 +1750,9 @@ class JsonDateTimeColumn(Column):
             return formats.date_format(value, self.datetime_format)
         return value
 
-    def get_cell_exported_value(self, rec, keep_original_type=True):
-        value = super().get_cell_value(rec)
+    exported_from_raw_value = True
+
+    def get_exported_value(self, value, keep_original_type=True):
         if isinstance(value, str):
             value = (
                 parse_datetime(value) or value
@@ -1657,8 +1784,9 @@ class TimeColumn(Column):
             return formats.time_format(value, self.time_format)
         return value
 
-    def get_cell_exported_value(self, rec, keep_original_type=True):
-        value = super().get_cell_value(rec)
+    exported_from_raw_value = True
+
+    def get_exported_value(self, value, keep_original_type=True):
         if isinstance(value, datetime.date):
             if keep_original_type:
                 value = value.replace(tzinfo=None)
@@ -1715,7 +1843,7 @@ class LinkColumn(Column):
     def get_href(self, rec, ctx, value):
         href_tpl = self.get_href_tpl(rec, value)
         if isinstance(href_tpl, str):
-            return href_tpl.format(**ctx)
+            return href_tpl.format_map(ctx)
         return None
 
     def get_cell_context(self, rec, value):
@@ -1852,7 +1980,7 @@ class FileColumn(LinkColumn):
                     else:
                         url = storage.url(value.name)
             else:
-                path = self.get_path_tpl(rec, ctx, value).format(**ctx)
+                path = self.get_path_tpl(rec, ctx, value).format_map(ctx)
                 if os.path.exists(path):
                     url = super().get_href(rec, ctx, value)
             if not url:
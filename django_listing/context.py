@@ -9,7 +9,7 @@ import pprint
 pp = pprint.PrettyPrinter(indent=4)
 import types
 
-__all__ = ["RenderContext"]
+__all__ = ["LazyRenderContext", "RenderContext"]
 
 
 def isgenerator(arg):
@@ -44,3 +44,58 @@ class RenderContext(dict):
 
     def __setattr__(self, attr, value):
         self[attr] = value
+
+
+class LazyRenderContext(RenderContext):
+    """
+    RenderContext that does not copy its fallback mappings : a key that is not
+    in the context itself is looked for in the fallbacks (in order) only when
+    it is needed, for example by str.format_map(). It still behaves like the
+    merged dict when it is iterated or unpacked with ``**``.
+    """
+
+    def __init__(self, fallbacks=(), *args, **kwargs):
+        object.__setattr__(self, "_fallbacks", fallbacks)
+        super().__init__(*args, **kwargs)
+
+    def __missing__(self, key):
+        for fallback in self.__dict__.get("_fallbacks", ()):
+            if key in fallback:
+                return fallback[key]
+        raise KeyError(key)
+
+    def __contains__(self, key):
+        return dict.__contains__(self, key) or any(
+            key in fallback for fallback in self._fallbacks
+        )
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def flatten(self):
+        ctx = {}
+        for fallback in reversed(self._fallbacks):
+            ctx.update(fallback)
+        ctx.update(dict.items(self))
+        return ctx
+
+    def keys(self):
+        return self.flatten().keys()
+
+    def values(self):
+        return self.flatten().values()
+
+    def items(self):
+        return self.flatten().items()
+
+    def __iter__(self):
+        return iter(self.flatten())
+
+    def __len__(self):
+        return len(self.flatten())
+
+    def copy(self):
+        return RenderContext(self.flatten())
@@ -55,3 +55,7 @@ class InvalidListingForm(ListingException):
 
 class InvalidAttachedForm(ListingException):
     pass
+
+
+class QueryBudgetExceeded(ListingException):
+    pass
@@ -0,0 +1,179 @@
+#
+# Created : 2026-10-17
+#
+# @author: Eric Lapouyade
+#
+import logging
+import os
+import tempfile
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+from django.utils import translation
+from django.utils.module_loading import import_string
+
+from django_listing import EXPORT_FORMATS_STREAMING
+
+__all__ = [
+    "EXPORT_JOB_QUERY_KEY",
+    "ExportJob",
+    "ExportJobBackend",
+    "ThreadExportJobBackend",
+    "get_export_job_backend",
+]
+
+logger = logging.getLogger("django_listing")
+
+EXPORT_JOB_QUERY_KEY = "djlst_export_job"
+EXPORT_JOB_CACHE_KEY = "django_listing_export_job:{}"
+
+
+def get_cache():
+    return caches[settings.django_listing_settings.EXPORT_JOB_CACHE]
+
+
+class ExportJob:
+    """State of a background export, shared through django cache"""
+
+    def __init__(self, filename, user_id=None):
+        self.id = uuid.uuid4().hex
+        self.filename = filename
+        self.user_id = user_id
+        self.status = "pending"  # "pending", "running", "done" or "error"
+        self.rows_done = 0
+        self.rows_total = None
+        self.path = None
+        self.error = None
+
+    @classmethod
+    def get(cls, job_id):
+        return get_cache().get(EXPORT_JOB_CACHE_KEY.format(job_id))
+
+    def save(self):
+        get_cache().set(
+            EXPORT_JOB_CACHE_KEY.format(self.id),
+            self,
+            settings.django_listing_settings.EXPORT_JOB_TIMEOUT,
+        )
+
+    def delete(self):
+        get_cache().delete(EXPORT_JOB_CACHE_KEY.format(self.id))
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+    def set_progress(self, rows_done):
+        self.rows_done = rows_done
+        self.save()
+
+    def get_progress(self):
+        if self.status == "done":
+            return 100
+        if not self.rows_total:
+            return 0
+        return min(99, int(self.rows_done * 100 / self.rows_total))
+
+    def get_status(self):
+        return dict(
+            id=self.id,
+            status=self.status,
+            rows_done=self.rows_done,
+            rows_total=self.rows_total,
+            progress=self.get_progress(),
+            filename=self.filename,
+            error=self.error,
+        )
+
+    def run(self, listing, export_format, headers, keep_original_type, language):
+        self.status = "running"
+        self.save()
+        try:
+            with translation.override(language):
+                self.rows_total = listing.exported_nb_rows()
+                self.save()
+                fd, self.path = tempfile.mkstemp(
+                    suffix="." + export_format.lower(),
+                    prefix="django_listing_export_",
+                    dir=settings.django_listing_settings.EXPORT_JOB_DIR,
+                )
+                with os.fdopen(fd, "wb") as fh:
+                    self.write_file(
+                        fh, listing, export_format, headers, keep_original_type
+                    )
+            self.rows_done = self.rows_total
+            self.status = "done"
+        except Exception as e:
+            logger.exception("Export job %s failed", self.id)
+            self.status = "error"
+            self.error = str(e)
+            if self.path and os.path.exists(self.path):
+                os.remove(self.path)
+            self.path = None
+        self.save()
+
+    def write_file(self, fh, listing, export_format, headers, keep_original_type):
+        """Write the export : streaming formats (JSONL...) chunk by chunk"""
+        if export_format in EXPORT_FORMATS_STREAMING:
+            for chunk in listing.exported_stream(
+                export_format, headers, keep_original_type, self.set_progress
+            ):
+                fh.write(chunk.encode())
+            return
+        data = listing.exported_file_content(
+            export_format, headers, keep_original_type, self.set_progress
+        )
+        if isinstance(data, str):
+            data = data.encode()
+        fh.write(data)
+
+
+class ExportJobBackend:
+    """
+    Run export jobs out of the request/response cycle.
+
+    Override submit() to use another executor : it must call job.run() with
+    the given arguments, job state is shared with the web workers through
+    django cache (EXPORT_JOB_CACHE) and the file is written in EXPORT_JOB_DIR.
+    """
+
+    def submit(self, job, *args):
+        raise NotImplementedError
+
+
+class ThreadExportJobBackend(ExportJobBackend):
+    """Run export jobs in a thread pool of the current process"""
+
+    _executor = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def get_executor(cls):
+        with cls._lock:
+            if cls._executor is None:
+                cls._executor = ThreadPoolExecutor(
+                    max_workers=settings.django_listing_settings.EXPORT_JOB_MAX_WORKERS,
+                    thread_name_prefix="django_listing_export",
+                )
+        return cls._executor
+
+    @staticmethod
+    def run(job, *args):
+        try:
+            job.run(*args)
+        finally:
+            # close database connections opened by this thread
+            connections.close_all()
+
+    def submit(self, job, *args):
+        job.save()
+        self.get_executor().submit(self.run, job, *args)
+
+
+def get_export_job_backend():
+    backend = settings.django_listing_settings.EXPORT_JOB_BACKEND
+    if isinstance(backend, str):
+        backend = import_string(backend)
+    return backend()
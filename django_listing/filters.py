@@ -4,17 +4,25 @@
 # @author: Eric Lapouyade
 #
 import copy
+import functools
+import hashlib
 import re
+import threading
+from collections import OrderedDict
 from datetime import timedelta
 from itertools import chain
 
 from dal import autocomplete
 from django import forms
-from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import EmptyResultSet, FieldDoesNotExist, ValidationError
 from django.db import models
 from django.db.models import QuerySet
 from django.forms import FileField, CheckboxInput
 from django.template import loader
+from django.utils import translation
+from django.utils.functional import Promise
 from django.utils.translation import gettext as _
 from django.utils.translation import gettext_lazy, pgettext_lazy
 
@@ -23,6 +31,7 @@ from .context import RenderContext
 from .exceptions import InvalidFilters
 from .form_fields import ListOfValuesField
 from .html_attributes import HTMLAttributes
+from .render_cache import get_model_version
 from .theme_config import ThemeTemplate, ThemeAttribute
 from .utils import init_dicts_from_class
 
@@ -49,6 +58,7 @@ __all__ = [
 
 # Declare keys only for "Filters" object
 FILTERS_KEYS = {
+    "cache_form_class",
     "form_attrs",
     "form_buttons",
     "form_layout",
@@ -121,6 +131,50 @@ FILTERS_FORM_FIELD_KEYS = {
 FILTERS_PARAMS_KEYS.update(FILTERS_KEYS)
 FILTERS_PARAMS_KEYS.update(FILTERS_FORM_FIELD_KEYS)
 DEFAULT_FILTER_HELP_TEXT = "&nbsp;"
+FILTER_CHOICES_CACHE_KEY = "django_listing_filter_choices:{}"
+
+
+def get_queryset_choices(key_parts, qs, format_label, choices_max):
+    """Get choices from a queryset, cached in FILTERS_CHOICES_CACHE
+
+    Returns None if there are more than choices_max objects. Cached choices
+    are invalidated on any write on the queryset model.
+    """
+    try:
+        sql = str(qs.query)
+    except EmptyResultSet:
+        return []
+    key_parts = (
+        *key_parts,
+        sql,
+        choices_max,
+        translation.get_language(),
+        get_model_version(qs.model),
+    )
+    key = FILTER_CHOICES_CACHE_KEY.format(
+        hashlib.sha256(repr(key_parts).encode()).hexdigest()
+    )
+    cache = caches[settings.django_listing_settings.FILTERS_CHOICES_CACHE]
+    choices = cache.get(key)
+    if choices is None:
+        objs = list(qs[: choices_max + 1])
+        if len(objs) > choices_max:
+            choices = False  # too many choices
+        else:
+            choices = [(obj.pk, format_label(obj)) for obj in objs]
+        timeout = settings.django_listing_settings.FILTERS_CHOICES_TIMEOUT
+        cache.set(key, choices, timeout)
+    return choices if choices is not False else None
+
+
+def get_label_from_attr(attr, obj):
+    return getattr(obj, attr, "-")
+
+
+def get_select_choices(no_choice_msg, *args):
+    # used as a form field callable choices, must not keep a reference to
+    # the listing, the form class may be cached
+    return [("", no_choice_msg)] + (get_queryset_choices(*args) or [])
 
 
 class FiltersBaseForm(forms.BaseForm):
@@ -191,6 +245,10 @@ class Filters(list):
     form_layout_advanced = None
     form_buttons = "reset,submit"
     show_advanced = False
+    cache_form_class = True  # build form class once per listing class, suffix...
+    # LRU form classes cache shared by all Filters objects
+    form_classes = OrderedDict()
+    form_classes_lock = threading.Lock()
 
     def __init__(self, *filters, params=None, **kwargs):
         self.init_kwargs = kwargs
@@ -357,9 +415,9 @@ class Filters(list):
         # This is possible because self is a copy of the Filters object
         # defined in the listing class. Copy is done on every request
         if not self._form:
-            fields = {
-                f.input_name + self.listing.suffix: f.create_form_field() for f in self
-            }
+            form_class = self.get_form_class()
+            for f in self:
+                f.need_media()
             initial = {
                 f.input_name + self.listing.suffix: f.default_value_func(f)
                 if callable(f.default_value_func)
@@ -367,13 +425,8 @@ class Filters(list):
                 for f in self
                 if f.default_value is not None or callable(f.default_value_func)
             }
-            form_class = type(
-                "FilterForm{}".format(self.listing.suffix),
-                (FiltersBaseForm,),
-                {"base_fields": fields},
-            )
             if self.listing.request.method == "POST":
-                for field_name, field in fields.items():
+                for field_name, field in form_class.base_fields.items():
                     if isinstance(field.widget, CheckboxInput):
                         if field_name not in self.listing.request.POST:
                             # Need to do that because
@@ -384,6 +437,46 @@ class Filters(list):
             self._form.listing = self.listing
         return self._form
 
+    def get_form_class_key(self):
+        filters_keys = tuple(f.get_form_class_key() for f in self)
+        if None in filters_keys:
+            return None
+        return (
+            self.listing.__class__,
+            self.listing.model,
+            self.listing.suffix,
+            settings.django_listing_settings.theme_config,
+            translation.get_language(),
+            filters_keys,
+        )
+
+    def get_form_class(self):
+        key = self.get_form_class_key() if self.cache_form_class else None
+        form_class = None
+        if key is not None:
+            with self.form_classes_lock:
+                form_class = self.form_classes.get(key)
+                if form_class is not None:
+                    self.form_classes.move_to_end(key)
+        if form_class is None:
+            fields = {
+                f.input_name + self.listing.suffix: f.create_form_field() for f in self
+            }
+            form_class = type(
+                "FilterForm{}".format(self.listing.suffix),
+                (FiltersBaseForm,),
+                {"base_fields": fields},
+            )
+            if key is not None:
+                cache_size = (
+                    settings.django_listing_settings.FILTERS_FORM_CLASSES_CACHE_SIZE
+                )
+                with self.form_classes_lock:
+                    self.form_classes[key] = form_class
+                    while len(self.form_classes) > cache_size:
+                        self.form_classes.popitem(last=False)
+        return form_class
+
     def get_hiddens_html(self):
         query_fields = [(FILTER_QUERYSTRING_PREFIX + f.name) for f in self]
         query_fields.append(FILTER_QUERYSTRING_PREFIX + "do_filter")
@@ -575,11 +668,13 @@ class Filter(metaclass=FilterMeta):
         self.filter_key = self.filter_key.replace(".", "__")
         if self.field_name is None:
             self.field_name, *dummy = self.filter_key.split("__")
+        # no lambda : format_label is part of the form class cache key
         if self.format_label is None:
-            self.format_label = lambda obj: str(obj)
+            self.format_label = str
         elif isinstance(self.format_label, str):
-            field = str(self.format_label)
-            self.format_label = lambda obj: getattr(obj, field, "-")
+            self.format_label = functools.partial(
+                get_label_from_attr, str(self.format_label)
+            )
         if self.input_name is None:
             self.input_name = FILTER_QUERYSTRING_PREFIX + self.name
         self.label = self.get_label()
@@ -667,6 +762,41 @@ class Filter(metaclass=FilterMeta):
         }
         return params
 
+    def get_form_class_key(self):
+        # the form field of this filter is cached with the form class :
+        # the key must change if the form field changes, None to disable caching
+        if self.queryset is None:
+            queryset_sql = None
+        else:
+            try:
+                queryset_sql = str(self.queryset.query)
+            except EmptyResultSet:
+                return None
+        return (
+            self.__class__,
+            self.name,
+            self.input_name,
+            queryset_sql,
+            self.get_form_params_key(),
+        )
+
+    def get_form_params_key(self):
+        # all parameters that may change the form field : label, choices,
+        # widget attrs... objects without a stable repr prevent reusing the
+        # cached form class but not from building the right one
+        params = []
+        for k in sorted(FILTERS_PARAMS_KEYS - {"queryset"}):
+            v = getattr(self, k, None)
+            if isinstance(v, QuerySet):
+                v = str(v.query)
+            elif isinstance(v, Promise):  # lazy translation, language is in the key
+                v = str(v)
+            params.append((k, v))
+        return repr(params)
+
+    def need_media(self):
+        pass
+
     def get_form_field_class(self, **kwargs):
         return self.form_field_class
 
@@ -764,46 +894,47 @@ class Filter(metaclass=FilterMeta):
             qs = qs.distinct()
         return qs
 
-    def filter_sequence(self, seq):
+    def get_sequence_predicate(self):
+        """Returns (key, lookup, predicate) to filter sequence rows on row[key]
+
+        or None when this filter does not filter anything.
+        """
         if not self.value:
-            return seq
+            return None
+        value = self.value
         key_filter = (
             self.filter_key if "__" in self.filter_key else f"{self.filter_key}__equal"
         )
-        key, filtr = key_filter.split("__", 1)
-        if filtr == "equal":
-            return filter(lambda rec: rec[key] == self.value, seq)
-        elif filtr == "contains":
-            return filter(
-                lambda rec: rec[key] is not None and self.value in str(rec[key]), seq
-            )
-        elif filtr == "icontains":
-            return filter(
-                lambda rec: rec[key] is not None
-                and self.value.lower() in str(rec[key]).lower(),
-                seq,
-            )
-        elif filtr == "regex":
-            return filter(lambda rec: re.search(self.value, rec[key]), seq)
-        elif filtr == "iregex":
-            return filter(lambda rec: re.search(self.value, rec[key], flags=re.I), seq)
-        elif filtr == "lt":
-            return filter(
-                lambda rec: rec[key] is not None and rec[key] < self.value, seq
-            )
-        elif filtr == "lte":
-            return filter(
-                lambda rec: rec[key] is not None and rec[key] <= self.value, seq
-            )
-        elif filtr == "gt":
-            return filter(
-                lambda rec: rec[key] is not None and rec[key] > self.value, seq
-            )
-        elif filtr == "gte":
-            return filter(
-                lambda rec: rec[key] is not None and rec[key] >= self.value, seq
-            )
-        return seq
+        key, lookup = key_filter.split("__", 1)
+        if lookup == "equal":
+            predicate = lambda v: v == value
+        elif lookup == "contains":
+            predicate = lambda v: v is not None and value in str(v)
+        elif lookup == "icontains":
+            lower_value = value.lower()
+            predicate = lambda v: v is not None and lower_value in str(v).lower()
+        elif lookup == "regex":
+            predicate = lambda v: re.search(value, v)
+        elif lookup == "iregex":
+            predicate = lambda v: re.search(value, v, flags=re.I)
+        elif lookup == "lt":
+            predicate = lambda v: v is not None and v < value
+        elif lookup == "lte":
+            predicate = lambda v: v is not None and v <= value
+        elif lookup == "gt":
+            predicate = lambda v: v is not None and v > value
+        elif lookup == "gte":
+            predicate = lambda v: v is not None and v >= value
+        else:
+            return None
+        return key, lookup, predicate
+
+    def filter_sequence(self, seq):
+        sequence_predicate = self.get_sequence_predicate()
+        if sequence_predicate is None:
+            return seq
+        key, lookup, predicate = sequence_predicate
+        return filter(lambda rec: predicate(rec[key]), seq)
 
     def extract_params(self, request_get_data):
         self.value = request_get_data.get(self.input_name + self.listing.suffix)
@@ -1039,14 +1170,67 @@ class MultipleChoiceFilter(Filter):
 
 class ForeignKeyFilter(Filter):
     form_field_class = forms.ChoiceField
+    # above choices_max related objects, an autocomplete widget is used if url
+    # is set, otherwise a text input for the related object primary key
+    choices_max = 1000
+    choices_mode = None  # "choices", "autocomplete" or "lazy"
+    params_keys = "choices_max"
+
+    def init(self, listing, name=None, **kwargs):
+        super().init(listing, name, **kwargs)
+        self.choices_mode = None
+
+    def get_choices_mode(self):
+        if self.choices_mode is None:
+            if self.get_related_choices() is not None:
+                self.choices_mode = "choices"
+            elif self.url:
+                self.choices_mode = "autocomplete"
+            else:
+                self.choices_mode = "lazy"
+        return self.choices_mode
+
+    def get_choices_args(self):
+        listing_class = self.listing.__class__
+        return (
+            (listing_class.__module__, listing_class.__qualname__, self.name),
+            self.get_related_qs(),
+            self.format_label,
+            self.choices_max,
+        )
+
+    def get_related_choices(self):
+        return get_queryset_choices(*self.get_choices_args())
+
+    def get_form_class_key(self):
+        key = super().get_form_class_key()
+        return key and (*key, self.get_choices_mode())
+
+    def need_media(self):
+        if self.get_choices_mode() == "autocomplete":
+            self.listing.need_media_for("autocomplete")
+
+    def get_form_field_class(self, **kwargs):
+        if self.get_choices_mode() == "choices":
+            return self.form_field_class
+        return forms.ModelChoiceField
 
     def get_form_field_widget(self, field_class, **kwargs):
         widget_attrs = self.widget_attrs or {}
         attrs = self.widget_params.get("attrs", {})
         widget_attrs = HTMLAttributes({**widget_attrs, **attrs})
-        widget = forms.Select
-        widget_attrs.add("class", self.theme_form_select_widget_class)
         params = dict(self.widget_params, attrs=widget_attrs)
+        choices_mode = self.get_choices_mode()
+        if choices_mode == "autocomplete":
+            widget = autocomplete.ModelSelect2
+            widget_attrs.add("class", self.theme_form_select_widget_class)
+            params["url"] = self.url
+        elif choices_mode == "lazy":
+            widget = forms.TextInput
+            widget_attrs.add("class", self.theme_form_widget_class)
+        else:
+            widget = forms.Select
+            widget_attrs.add("class", self.theme_form_select_widget_class)
         return widget(**params)
 
     def get_choices_order(self):
@@ -1066,12 +1250,16 @@ class ForeignKeyFilter(Filter):
 
     def get_form_field_params(self, **kwargs):
         params = super().get_form_field_params(**kwargs)
-        self.set_params_choices(params)
-        choices = [("", self.no_choice_msg)]
-        choices += [(obj.pk, self.format_label(obj)) for obj in self.get_related_qs()]
-        params["choices"] = choices
-        if "queryset" in params:
-            del params["queryset"]
+        if self.get_choices_mode() == "choices":
+            self.set_params_choices(params)
+            # choices are read from cache each time the form field needs them
+            params["choices"] = functools.partial(
+                get_select_choices, self.no_choice_msg, *self.get_choices_args()
+            )
+            params.pop("queryset", None)
+        else:
+            params.pop("choices", None)
+            params["queryset"] = self.get_related_qs()
         return params
 
 
@@ -1115,8 +1303,10 @@ class AutocompleteForeignKeyFilter(Filter):
             params["queryset"] = related_model.objects.all()
         return params
 
-    def get_form_field_widget(self, field_class, **kwargs):
+    def need_media(self):
         self.listing.need_media_for("autocomplete")
+
+    def get_form_field_widget(self, field_class, **kwargs):
         widget_attrs = self.widget_attrs or {}
         attrs = self.widget_params.get("attrs", {})
         widget_attrs = HTMLAttributes({**widget_attrs, **attrs})
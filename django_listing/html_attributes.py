@@ -9,7 +9,73 @@ from django.utils.safestring import mark_safe
 __all__ = ["HTMLAttributes", "Tag", "Html"]
 
 
+# attributes whose values are kept in HTMLAttributeValues by HTMLAttributes
+VALUES_ATTRS = ("class", "style")
+
+
+def split_value(attr, value):
+    # use str to consume lazy strings
+    if attr == "style":
+        return [v.strip() for v in str(value).split(";") if v.strip()]
+    return str(value).split()
+
+
+class HTMLAttributeValues:
+    """Ordered set of the values of a class or style HTML attribute
+
+    Values are kept in insertion order and joined only once when converted to
+    a string, so that HTML output is deterministic. Objects are not modified
+    once created : they can be shared by HTMLAttributes copies. Other str
+    methods are available on the joined string.
+    """
+
+    __slots__ = ("values", "separator", "string")
+
+    def __init__(self, values, separator=" "):
+        self.values = values
+        self.separator = separator
+        self.string = None
+
+    def __str__(self):
+        if self.string is None:
+            self.string = self.separator.join(self.values)
+        return self.string
+
+    def __repr__(self):
+        return repr(str(self))
+
+    def __bool__(self):
+        return bool(self.values)
+
+    def __eq__(self, other):
+        return str(self) == str(other)
+
+    def __hash__(self):
+        return hash(str(self))
+
+    def __add__(self, other):
+        return str(self) + other
+
+    def __radd__(self, other):
+        return other + str(self)
+
+    def __contains__(self, item):
+        return item in str(self)
+
+    def __getattr__(self, attr):
+        if attr.startswith("__"):
+            raise AttributeError(attr)
+        return getattr(str(self), attr)
+
+
 class HTMLAttributes(dict):
+    """HTML attributes, rendered as a string with str()
+
+    class and style values modified with add() or remove() are stored in
+    HTMLAttributeValues, which are replaced, not modified : copies share them
+    until one of the copies adds or removes a value.
+    """
+
     def __init__(self, *args, **kwargs):
         # remove starting underscore to be able to use '_class'
         # instead of 'class' in kwargs (reserved keyword)
@@ -17,45 +83,53 @@ class HTMLAttributes(dict):
             kwargs["class"] = kwargs.pop("_class")
         super().__init__(*args, **kwargs)
 
+    def get_values(self, attr):
+        """Copy of class or style values as a dict used as an ordered set"""
+        values = self.get(attr)
+        if values.__class__ is HTMLAttributeValues:
+            return values.values.copy()
+        return dict.fromkeys(split_value(attr, values)) if values else {}
+
     def add(self, attr, value):
         if value is not None:
-            if isinstance(value, int):
-                value = str(value)
-            if attr not in self:
-                s = set()
-            else:
-                if attr == "style":
-                    s = set(self[attr].split(";"))
-                else:
-                    s = set(self[attr].split())
+            if attr == "class" and value.__class__ is str:
+                values = self.get_values(attr)
+                values.update(dict.fromkeys(value.split()))
+                self[attr] = HTMLAttributeValues(values)
+                return
             if isinstance(value, set):
-                s.update(value)
+                # sort to get the same HTML whatever the set order
+                value = sorted(map(str, value))
             else:
-                s.add(value)
-            if attr == "style":
-                # use str to consume lazy strings
-                self[attr] = (";".join(map(str, s))).strip()
+                value = [value]
+            if attr in VALUES_ATTRS:
+                values = self.get_values(attr)
+                for v in value:
+                    values.update(dict.fromkeys(split_value(attr, v)))
+                separator = ";" if attr == "style" else " "
+                self[attr] = HTMLAttributeValues(values, separator)
             else:
+                values = dict.fromkeys(self[attr].split()) if attr in self else {}
                 # use str to consume lazy strings
-                self[attr] = (" ".join(map(str, s))).strip()
+                values.update(dict.fromkeys(map(str, value)))
+                self[attr] = (" ".join(values)).strip()
 
     def remove(self, attr, value):
         if value is not None:
-            if attr not in self:
-                s = set()
-            else:
-                if attr == "style":
-                    s = set(self[attr].split(";"))
-                else:
-                    s = set(self[attr].split())
-            if isinstance(value, set):
-                s -= value
-            else:
-                s -= set([value])  # do not use remove() to avoid KeyError
-            if attr == "style":
-                self[attr] = (";".join(s)).strip()
+            if not isinstance(value, set):
+                value = [value]
+            if attr in VALUES_ATTRS:
+                values = self.get_values(attr)
+                for v in value:
+                    for split_v in split_value(attr, v):
+                        values.pop(split_v, None)  # do not use del to avoid KeyError
+                separator = ";" if attr == "style" else " "
+                self[attr] = HTMLAttributeValues(values, separator)
             else:
-                self[attr] = (" ".join(s)).strip()
+                values = dict.fromkeys(self[attr].split()) if attr in self else {}
+                for v in value:
+                    values.pop(v, None)
+                self[attr] = (" ".join(values)).strip()
 
     def set(self, attr, value=None):
         self[attr] = value
@@ -71,6 +145,7 @@ class HTMLAttributes(dict):
         super().update(*args, **kwargs)
 
     def copy(self):
+        # HTMLAttributeValues are shared as they are never modified
         return HTMLAttributes(self)
 
     def __str__(self):
@@ -0,0 +1,367 @@
+#
+# Created : 2026-10-17
+#
+# @author: Eric Lapouyade
+#
+import functools
+import inspect
+import logging
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+from django.dispatch import Signal
+from django.utils.html import escape
+
+from .exceptions import QueryBudgetExceeded
+
+__all__ = [
+    "ListingProfiler",
+    "ListingQueryStats",
+    "listing_phase",
+    "listing_profiled",
+    "listing_queries_tracked",
+    "track_phase",
+]
+
+logger = logging.getLogger("django_listing")
+
+# sent when a listing rendering has been tracked, with listing and stats arguments
+listing_queries_tracked = Signal()
+# sent when a listing rendering has been profiled, with listing and stats arguments
+listing_profiled = Signal()
+
+
+def get_trackers(listing):
+    return [
+        tracker
+        for tracker in (listing.query_stats, listing.profiler)
+        if tracker is not None
+    ]
+
+
+@contextmanager
+def listing_phase(listing, name):
+    """Track queries and time of a phase of listing done outside its methods"""
+    with ExitStack() as stack:
+        for tracker in get_trackers(listing):
+            stack.enter_context(tracker.phase(name))
+        yield
+
+
+def track_phase(name):
+    """Decorator for Listing methods : track queries and time of this phase
+
+    Works on generator methods too : only the time spent to produce each
+    item is tracked, not the time spent by the consumer.
+    """
+
+    def decorator(method):
+        if inspect.isgeneratorfunction(method):
+
+            @functools.wraps(method)
+            def wrapper(self, *args, **kwargs):
+                trackers = get_trackers(self)
+                if not trackers:
+                    yield from method(self, *args, **kwargs)
+                    return
+                iterator = method(self, *args, **kwargs)
+                while True:
+                    with ExitStack() as stack:
+                        for tracker in trackers:
+                            stack.enter_context(tracker.phase(name))
+                        try:
+                            item = next(iterator)
+                        except StopIteration:
+                            return
+                    yield item
+
+        else:
+
+            @functools.wraps(method)
+            def wrapper(self, *args, **kwargs):
+                trackers = get_trackers(self)
+                if not trackers:
+                    return method(self, *args, **kwargs)
+                with ExitStack() as stack:
+                    for tracker in trackers:
+                        stack.enter_context(tracker.phase(name))
+                    return method(self, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+class ListingQueryStats:
+    """Count SQL queries and their time per rendering phase and per column
+
+    Queries are counted with connection.execute_wrapper() on all databases
+    between start() and stop(), use track_thread() to count the queries done
+    by other threads too. Only the queries done during a phase are counted :
+    the other listings of the page may use the same connections meanwhile. A
+    query is attributed to the innermost phase and to the column being
+    rendered if any.
+    """
+
+    def __init__(self, listing, max_queries=None):
+        self.listing = listing
+        self.max_queries = max_queries
+        self.queries = 0
+        self.time = 0.0
+        self.phases = {}
+        self.columns = {}
+        self._phases_stack = []
+        self._column = None
+        self._exit_stack = None
+
+    def __call__(self, execute, sql, params, many, context):
+        if not self._phases_stack:
+            return execute(sql, params, many, context)
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.queries += 1
+            self.time += duration
+            phase = self.phases[self._phases_stack[-1]]
+            phase["queries"] += 1
+            phase["time"] += duration
+            if self._column is not None:
+                column = self.columns[self._column]
+                column["queries"] += 1
+                column["time"] += duration
+
+    def start(self):
+        if self._exit_stack is None:
+            self._exit_stack = ExitStack()
+            for connection in connections.all():
+                self._exit_stack.enter_context(connection.execute_wrapper(self))
+
+    def stop(self):
+        if self._exit_stack is not None:
+            self._exit_stack.close()
+            self._exit_stack = None
+            self.report()
+
+    @property
+    def running(self):
+        return self._exit_stack is not None
+
+    @contextmanager
+    def track_thread(self):
+        """Count the queries done by the current thread connections too"""
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(self))
+            yield
+
+    @contextmanager
+    def phase(self, name):
+        self.phases.setdefault(name, {"queries": 0, "time": 0.0})
+        self._phases_stack.append(name)
+        try:
+            yield
+        finally:
+            self._phases_stack.pop()
+
+    @contextmanager
+    def column(self, name):
+        column = self.columns.setdefault(name, {"queries": 0, "time": 0.0, "cells": 0})
+        column["cells"] += 1
+        previous, self._column = self._column, name
+        try:
+            yield
+        finally:
+            self._column = previous
+
+    def get_n_plus_one_columns(self):
+        """Columns doing at least one query per rendered cell"""
+        return [
+            name
+            for name, column in self.columns.items()
+            if column["cells"] > 1 and column["queries"] >= column["cells"]
+        ]
+
+    def as_dict(self):
+        return {
+            "listing": self.listing.__class__.__name__,
+            "queries": self.queries,
+            "time": self.time,
+            "max_queries": self.max_queries,
+            "phases": self.phases,
+            "columns": self.columns,
+            "n_plus_one_columns": self.get_n_plus_one_columns(),
+        }
+
+    def report(self):
+        stats = self.as_dict()
+        logger.debug("%s queries : %s", stats["listing"], stats)
+        if stats["n_plus_one_columns"]:
+            logger.warning(
+                "%s : columns %s do at least one query per row",
+                stats["listing"],
+                ", ".join(stats["n_plus_one_columns"]),
+            )
+        listing_queries_tracked.send(
+            sender=self.listing.__class__, listing=self.listing, stats=stats
+        )
+        if self.max_queries is not None and self.queries > self.max_queries:
+            msg = "{} did {} queries, more than max_queries = {}".format(
+                stats["listing"], self.queries, self.max_queries
+            )
+            if settings.django_listing_settings.QUERY_BUDGET_RAISE:
+                raise QueryBudgetExceeded(msg)
+            logger.warning(msg)
+
+    def as_html(self):
+        n_plus_one = self.get_n_plus_one_columns()
+        out = "<b><u>SQL queries :</u></b><br>"
+        out += f"Total : {self.queries} queries in {self.time * 1000:.1f} ms"
+        if self.max_queries is not None:
+            out += f" (max_queries = {self.max_queries})"
+        out += "<br>"
+        for name, phase in self.phases.items():
+            out += "Phase {} : {} queries in {:.1f} ms<br>".format(
+                escape(name), phase["queries"], phase["time"] * 1000
+            )
+        for name, column in self.columns.items():
+            out += "Column {} : {} queries for {} cells in {:.1f} ms{}<br>".format(
+                escape(name),
+                column["queries"],
+                column["cells"],
+                column["time"] * 1000,
+                " <b>(N+1)</b>" if name in n_plus_one else "",
+            )
+        return out
+
+
+class ListingProfiler:
+    """Time spent per rendering phase, per column and per listing hook
+
+    install() wraps the cell renderers, get_row_attrs(), aggregate() and
+    paginator.get_context() of the listing, uninstall() is done by stop().
+    Times are cumulative, calls is the number of cells for columns.
+    """
+
+    hooks_names = ("get_row_attrs", "aggregate")
+
+    def __init__(self, listing):
+        self.listing = listing
+        self.time = 0.0
+        self.phases = {}
+        self.columns = {}
+        self.hooks = {}
+        self._start = None
+        self._col_cell_renderers = None
+
+    def start(self):
+        if self._start is None:
+            self._start = time.perf_counter()
+
+    def stop(self):
+        if self._start is not None:
+            self.time = time.perf_counter() - self._start
+            self._start = None
+            self.uninstall()
+            self.report()
+
+    @property
+    def running(self):
+        return self._start is not None
+
+    @contextmanager
+    def timer(self, timings, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            timing = timings.setdefault(name, {"time": 0.0, "calls": 0})
+            timing["time"] += time.perf_counter() - start
+            timing["calls"] += 1
+
+    def phase(self, name):
+        return self.timer(self.phases, name)
+
+    def wrap(self, timings, name, func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with self.timer(timings, name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    def install(self):
+        listing = self.listing
+        if self._col_cell_renderers is not None:
+            return
+        self._col_cell_renderers = listing.col_cell_renderers
+        listing.col_cell_renderers = {
+            col: self.wrap(self.columns, col.name, renderer)
+            for col, renderer in self._col_cell_renderers.items()
+        }
+        for name in self.hooks_names:
+            setattr(listing, name, self.wrap(self.hooks, name, getattr(listing, name)))
+        if listing.paginator:
+            listing.paginator.get_context = self.wrap(
+                self.hooks, "paginator.get_context", listing.paginator.get_context
+            )
+
+    def uninstall(self):
+        listing = self.listing
+        if self._col_cell_renderers is None:
+            return
+        listing.col_cell_renderers = self._col_cell_renderers
+        self._col_cell_renderers = None
+        for name in self.hooks_names:
+            listing.__dict__.pop(name, None)
+        if listing.paginator:
+            listing.paginator.__dict__.pop("get_context", None)
+
+    @staticmethod
+    def timings_as_dict(timings):
+        return {
+            name: dict(
+                timing,
+                time_per_call=(
+                    timing["time"] / timing["calls"] if timing["calls"] else 0
+                ),
+            )
+            for name, timing in timings.items()
+        }
+
+    def as_dict(self):
+        return {
+            "listing": self.listing.__class__.__name__,
+            "time": self.time,
+            "phases": self.timings_as_dict(self.phases),
+            "columns": self.timings_as_dict(self.columns),
+            "hooks": self.timings_as_dict(self.hooks),
+        }
+
+    def report(self):
+        stats = self.as_dict()
+        logger.debug("%s profile : %s", stats["listing"], stats)
+        listing_profiled.send(
+            sender=self.listing.__class__, listing=self.listing, stats=stats
+        )
+
+    def as_html(self):
+        stats = self.as_dict()
+        out = "<b><u>Rendering time :</u></b><br>"
+        out += f"Total : {self.time * 1000:.1f} ms<br>"
+        for kind in ("phases", "columns", "hooks"):
+            timings = sorted(
+                stats[kind].items(), key=lambda item: item[1]["time"], reverse=True
+            )
+            for name, timing in timings:
+                out += "{} {} : {:.1f} ms for {} calls ({:.3f} ms per call)<br>".format(
+                    kind[:-1].capitalize(),
+                    escape(name),
+                    timing["time"] * 1000,
+                    timing["calls"],
+                    timing["time_per_call"] * 1000,
+                )
+        return out
@@ -5,15 +5,21 @@
 #
 
 import collections
+import copy
+import csv
+import io
+import json
 import logging
 import re
 from datetime import datetime
-from urllib.parse import urlsplit, urlunsplit, quote
+from urllib.parse import urlsplit, quote
 
 import tablib
+from asgiref.sync import sync_to_async
 from django import forms
 from django.conf import settings
 from django.contrib import messages
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db.models import Model, Count, Min, Max, Sum, Avg
 from django.db.models.query import QuerySet
 from django.http import QueryDict
@@ -21,17 +27,20 @@ from django.middleware.csrf import get_token as get_csrf_token
 from django.template import loader
 from django.utils.translation import gettext as _
 from django.utils.translation import gettext_lazy, pgettext_lazy
-from django.utils import timezone
+from django.utils import timezone, translation
+from django.utils.html import escape
 
 from django_listing import (
     EXPORT_FORMATS,
     EXPORT_FORMATS_KEEP_ORIGINAL_TYPE,
+    EXPORT_FORMATS_STREAMING,
     EXPORT_FORMATS_USE_COL_NAME,
     EXPORT_EXCEL_SANITIZE_RE,
     FILTER_QUERYSTRING_PREFIX,
 )
 
 from .columns import (
+    COLUMNS_FORM_FIELD_KEYS,
     COLUMNS_PARAMS_KEYS,
     ModelColumns,
     SelectionColumn,
@@ -44,13 +53,24 @@ from .columns import (
 )
 from .context import RenderContext
 from .exceptions import *
+from .export_jobs import ExportJob, get_export_job_backend
 from .filters import FILTERS_PARAMS_KEYS, Filters
 from .html_attributes import HTMLAttributes
+from .instrumentation import (
+    ListingProfiler,
+    ListingQueryStats,
+    get_trackers,
+    listing_phase,
+    track_phase,
+)
 from .attached_form import ATTACHED_FORM_PARAMS_KEYS, ListingBaseForm
 from .paginators import PAGINATOR_PARAMS_KEYS, Paginator
 from .record import RecordManager
+from .render_cache import RENDER_CACHE_CSRF_PLACEHOLDER, RenderCache
+from .sequence_engines import invalidate_sequence_engine
 from .theme_config import ThemeAttribute, ThemeTemplate
 from .toolbar import TOOLBAR_PARAMS_KEYS, Toolbar
+from .url_builder import URL_VALUE_PLACEHOLDER, ListingURLBuilder, ListingURLPattern
 from .utils import init_dicts_from_class, validate_values_names
 
 __all__ = ["ListingVariations", "Listing", "DivListing", "logger"]
@@ -70,6 +90,7 @@ LISTING_SELECTOR_CSS_CLASS = "row-selector"
 # only these parameters are allowed in the query string.
 LISTING_QUERY_STRING_KEYS = {
     "action_button",
+    "cursor",
     "editing",
     "editing_columns",
     "editing_row_pk",
@@ -109,6 +130,7 @@ LISTING_PARAMS_KEYS = {
     "confirm_msg_for_update",
     "confirm_msg_nb_items_for_update",
     "container_attrs",
+    "count_strategy",  # "exact", "estimated" or "has_next"
     "data",
     "datetimepicker_date_format",
     "datetimepicker_datetime_format",
@@ -127,8 +149,11 @@ LISTING_PARAMS_KEYS = {
     "empty_table_msg",
     "exclude_columns",
     "export",
+    "export_chunk_size",
     "export_columns",
+    "export_in_background",
     "export_max_rows",
+    "export_streaming",
     "filters",
     "footer_snippet",
     "footer_template_name",
@@ -150,20 +175,30 @@ LISTING_PARAMS_KEYS = {
     "id",
     "link_object_columns",
     "listing_template_name",
+    "max_queries",
     "name",
     "no_permission_required_for_actions",
     "offset_max",
     "onready_snippet",
+    "optimize_queryset",
+    "optimize_queryset_only",
     "orphans",
     "page",
     "paginator_class",
     "per_page",
     "per_page_max",
+    "profile",
     "primary_key",
     "processed_flash",
     "processed_pks",
     "record_label",
     "record_label_plural",
+    "render_cache",
+    "render_cache_class",
+    "render_cache_invalidation",
+    "render_cache_models",
+    "render_cache_probe_field",
+    "render_cache_timeout",
     "request_media_for",
     "row_attrs",
     "row_form_base_class",
@@ -179,6 +214,9 @@ LISTING_PARAMS_KEYS = {
     "selection_multiple_ctrl",
     "selection_overlay_template_name",
     "selection_position",
+    "sequence_cache",
+    "sequence_engine",
+    "sequence_version",
     "small_device_header_style",
     "sort",
     "sortable",
@@ -205,6 +243,7 @@ LISTING_PARAMS_KEYS = {
     "theme_table_header_class",
     "toolbar",
     "toolbar_placement",
+    "track_queries",
     "unsortable",
     "use_datetimepicker",
     "variation",
@@ -499,8 +538,10 @@ class Listing(ListingBase):
     attached_form_autofill = False
     attached_form_base_class = ListingBaseForm
     attached_form_css_id = None
+    cached_render = None  # HTML found in the render cache by render_init()
     container_attrs = {}
     current_page = None  # set in RecordManager.compute_current_page_records()
+    cursor = None  # used by KeysetPaginator
     data = None
     datetimepicker_date_format = "Y-m-d"
     datetimepicker_datetime_format = "Y-m-d H:i"
@@ -517,8 +558,11 @@ class Listing(ListingBase):
     empty_table_msg = None
     exclude_columns = None
     export = None
+    export_chunk_size = 2000  # rows fetched from the database at once
     export_columns = None
+    export_in_background = False  # for formats not in EXPORT_FORMATS_STREAMING
     export_max_rows = None
+    export_streaming = True  # for formats in EXPORT_FORMATS_STREAMING
     exported_columns = None
     filters = None
     footer_snippet = None
@@ -539,6 +583,7 @@ class Listing(ListingBase):
     has_group_by = False
     has_header = True
     has_hidden_selection = False
+    count_strategy = "exact"  # "exact", "estimated" or "has_next"
     has_nb_unfiltered_rows = False
     has_paginator = True
     has_toolbar = False
@@ -546,26 +591,41 @@ class Listing(ListingBase):
     id = None
     link_object_columns = None
     listing_template_name = ThemeTemplate("listing.html")
+    max_queries = None  # log a warning when a rendering does more SQL queries
     model = None
     name = None
     no_permission_required_for_actions = False
     offset_max = LISTING_OFFSET_MAX
     only_one_with_prefix = None
+    optimize_queryset = True  # auto select_related/prefetch_related from columns
+    optimize_queryset_only = False  # also .only() load the columns fields
     onready_snippet = None
     orphans = 0
     page = 1
     pagination = True
+    queryset_optimizations = None  # set by RecordManager.optimize_queryset()
+    query_stats = None  # ListingQueryStats of the current rendering if tracked
     paginator = None
     paginator_class = Paginator
     per_page = LISTING_ROWS_PER_PAGE
     per_page_max = LISTING_ROWS_PER_PAGE_MAX
     permission_required_for_export = False
+    prerendered = None  # HTML rendered by arender()
     primary_key = "id"
     processed_flash = True
     processed_pks = None
+    profile = False  # time rendering phases, columns and hooks
+    profiler = None  # ListingProfiler of the current rendering if profiled
     record_label = None
     record_label_plural = None
     records_class = RecordManager
+    render_cache = False  # cache rendered HTML, see RenderCache
+    render_cache_class = RenderCache
+    render_cache_instance = None  # RenderCache of the current rendering
+    render_cache_invalidation = "ttl"  # "ttl", "version" or "probe"
+    render_cache_models = None  # models to watch in addition to listing model
+    render_cache_probe_field = "updated_at"  # for "probe" invalidation
+    render_cache_timeout = 300
     request_media_for = None
     row_attrs = {}
     row_form_base_class = ListingBaseForm
@@ -584,12 +644,16 @@ class Listing(ListingBase):
     selection_multiple_ctrl = False
     selection_overlay_template_name = ThemeTemplate("selection_overlay.html")
     selection_position = "hidden"  # left, right or hidden
+    sequence_cache = False  # keep sequence data ingested across requests
+    sequence_engine = "python"  # "python" or "numpy" to filter/sort sequences
+    sequence_version = None  # identifies sequence data in cache instead of its id
     small_device_header_style = "font-weight: bold"
     sort = None
     sortable = True
     suffix = None
     toolbar = None
     toolbar_placement = "both"
+    track_queries = False  # count SQL queries per phase and per column
     unsortable = True
     use_datetimepicker = False
     variation = None
@@ -631,6 +695,7 @@ class Listing(ListingBase):
         self.request = None
         self.request_data = None
         self.parsed_url = None
+        self._url_builder = None
         self.page_context = None
         self.records = self.records_class(self)
         self.rows_context_list = []
@@ -639,6 +704,7 @@ class Listing(ListingBase):
         self.editing_really_hidden_columns = set()
         self.can_edit_columns = []
         self.col_cell_renderers = {}
+        self._instance_column_overrides = None
         init_dicts_from_class(
             self, ["global_context", "attrs", "container_attrs", "row_attrs"]
         )
@@ -673,6 +739,104 @@ class Listing(ListingBase):
             )
         return Listing.params_keys
 
+    @classmethod
+    def get_class_attrs(cls):
+        """Names of the class attributes, computed once per Listing subclass"""
+        attrs = cls.__dict__.get("_class_attrs")
+        if attrs is None:
+            attrs = cls._class_attrs = frozenset(dir(cls))
+        return attrs
+
+    @classmethod
+    def clear_class_cache(cls):
+        """To call if the class attributes are modified at runtime"""
+        for attr in ("_class_attrs", "_columns_params_attrs", "_column_overrides"):
+            if attr in cls.__dict__:
+                delattr(cls, attr)
+
+    @staticmethod
+    def find_columns_params_attrs(names, col_class):
+        keys = COLUMNS_PARAMS_KEYS | COLUMNS_FORM_FIELD_KEYS
+        attrs = {}
+        # It is possible to prefix with the column class in lower + "s"
+        # example : booleancolumns_reverse_form_label_tag = True
+        for prefix in ("columns_", "{}s_".format(col_class.__name__.lower())):
+            for name in sorted(names):
+                if name.startswith(prefix) and name[len(prefix) :] in keys:
+                    attrs[name] = name[len(prefix) :]
+        return [(k, name) for name, k in attrs.items()]
+
+    def get_columns_params_attrs(self, col_class):
+        """(param, listing attribute) for columns_<param> and <class>s_<param>
+
+        Attributes declared in the class are searched once per Listing subclass
+        and column class, only the ones given to the listing instance are
+        searched at each request. columns_<param> attributes are first.
+        """
+        cache = self.__class__.__dict__.get("_columns_params_attrs")
+        if cache is None:
+            cache = self.__class__._columns_params_attrs = {}
+        # new column classes may add parameters
+        key = (col_class, len(COLUMNS_PARAMS_KEYS))
+        attrs = cache.get(key)
+        if attrs is None:
+            attrs = cache[key] = self.find_columns_params_attrs(
+                self.get_class_attrs(), col_class
+            )
+        class_attrs = self.get_class_attrs()
+        instance_attrs = self.find_columns_params_attrs(
+            [name for name in self.__dict__ if name not in class_attrs], col_class
+        )
+        if instance_attrs:
+            attrs = sorted(
+                attrs + instance_attrs, key=lambda a: not a[1].startswith("columns_")
+            )
+        return attrs
+
+    @staticmethod
+    def index_column_overrides(names):
+        """{colname: {param: attribute name}} of <colname>__<param> names"""
+        index = {}
+        for name in sorted(names):
+            if name.startswith("__"):
+                continue
+            # column names may contain "__" too (ex: company__name)
+            pos = name.find("__")
+            while pos > 0:
+                index.setdefault(name[:pos], {})[name[pos + 2 :]] = name
+                pos = name.find("__", pos + 2)
+        return index
+
+    def get_column_overrides(self, col_name):
+        """{param: listing attribute} for <col_name>__<param> listing attributes
+
+        Class attributes are indexed once per Listing subclass, instance
+        attributes are indexed again only when their names change.
+        """
+        index = self.__class__.__dict__.get("_column_overrides")
+        if index is None:
+            index = self.__class__._column_overrides = self.index_column_overrides(
+                self.get_class_attrs()
+            )
+        overrides = index.get(col_name, {})
+        names = tuple(name for name in self.__dict__ if "__" in name)
+        if not names:
+            return overrides
+        if (
+            self._instance_column_overrides is None
+            or self._instance_column_overrides[0] != names
+        ):
+            self._instance_column_overrides = (
+                names,
+                self.index_column_overrides(names),
+            )
+        instance_overrides = self._instance_column_overrides[1].get(col_name)
+        if instance_overrides:
+            overrides = dict(
+                sorted({**overrides, **instance_overrides}.items(), key=lambda i: i[1])
+            )
+        return overrides
+
     def set_kwargs(self, **kwargs):
         self.store_kwargs(**kwargs)
         params_keys = self.get_params_keys()
@@ -1028,7 +1192,8 @@ class Listing(ListingBase):
         self.create_missing_toolbar_items()
         self.has_toolbar = bool(self.toolbar)
         self.columns = self.columns.bind_to_listing(self)
-        for col in self.columns:
+        for index, col in enumerate(self.columns):
+            col.cell_value_index = index
             col.render_init_context(context)
         if self.attached_form:
             self.attached_form = self.attached_form.bind_to_listing(self)
@@ -1118,6 +1283,7 @@ class Listing(ListingBase):
         if isinstance(self.request_media_for, str):
             self.request_media_for = map(str.strip, self.request_media_for.split(","))
 
+    @track_phase("render_init")
     def render_init(self, context):
         if not self._render_initialized:
             self.render_init_context(context)
@@ -1157,9 +1323,20 @@ class Listing(ListingBase):
                 self.attached_form.render_init(context)
             self.global_context_init()
             self.do_filter_data()
-            self.compute_current_page_records()
+            # on a cache hit, there is no need to run the page queries
+            if self.lookup_render_cache() is None:
+                self.compute_current_page_records()
             self._render_initialized = True
 
+    def lookup_render_cache(self):
+        """Return the cached rendering if render_cache is set and it is cached"""
+        self.render_cache_instance = None
+        self.cached_render = None
+        if self.render_cache and not self.django_listing_info():
+            self.render_cache_instance = self.render_cache_class(self)
+            self.cached_render = self.render_cache_instance.get()
+        return self.cached_render
+
     def do_filter_data(self):
         # Last chance to filter data before listing page computation
         pass
@@ -1173,12 +1350,79 @@ class Listing(ListingBase):
         self.records.compute_current_page_records()
 
     def render(self, context):
-        response = self.render_init(context)
-        if response is not None:
-            return response
-        return self.render_template()
-
+        if self.prerendered is not None:
+            # already rendered by arender()
+            return self.prerendered
+        self.start_instrumentation(context)
+        try:
+            response = self.render_init(context)
+            if response is not None:
+                return response
+            return self.render_template()
+        finally:
+            self.stop_instrumentation()
+
+    async def arender(self, context):
+        """Asynchronous render() for ASGI
+
+        The rows count, the current page rows and the global aggregations
+        are fetched concurrently with django async ORM (see
+        RecordManager.aprefetch()), the rest runs in sync_to_async(). The
+        output is kept so that a later render() in a template returns it.
+        """
+        await sync_to_async(self.start_instrumentation)(context)
+        try:
+            prefetch = not self._render_initialized
+            self.records.defer_page_records = True
+            try:
+                response = await sync_to_async(self.render_init)(context)
+            finally:
+                self.records.defer_page_records = False
+            if response is not None:
+                return response
+            if prefetch and self.cached_render is None:
+                with listing_phase(self, "prefetch"):
+                    await self.records.aprefetch()
+                await sync_to_async(self.compute_current_page_records)()
+            self.prerendered = await sync_to_async(self.render_template)()
+            return self.prerendered
+        finally:
+            await sync_to_async(self.stop_instrumentation)()
+
+    def start_instrumentation(self, context):
+        """Start queries tracking and profiling if requested
+
+        Does nothing if already started : ListingViewMixin starts it before
+        render_init() so that count and page queries are tracked too.
+        """
+        if any(tracker.running for tracker in get_trackers(self)):
+            return
+        request = getattr(context, "request", None) or self.request
+        request_for_info = request is not None and request.GET.get(
+            "__django_listing_info__"
+        )
+        if self.track_queries or self.max_queries is not None or request_for_info:
+            self.query_stats = ListingQueryStats(self, self.max_queries)
+            self.query_stats.start()
+        if self.profile or request_for_info:
+            self.profiler = ListingProfiler(self)
+            self.profiler.start()
+
+    def stop_instrumentation(self):
+        if self.profiler is not None:
+            self.profiler.stop()
+        if self.query_stats is not None:
+            self.query_stats.stop()
+
+    @track_phase("export_data")
     def export_data(self):
+        """Prepare request.export_data if an export is requested
+
+        Streamed exports (export_streaming) are produced by the response after
+        the listing rendering : their queries and time are not in the tracked
+        queries nor in the profile, the export_data phase only covers the
+        export setup. Set export_streaming = False to profile an export.
+        """
         if self.export and not hasattr(self.request, "export_data"):
             if not self.has_permission_for_action("export"):
                 raise ListingException(_("[You do not have permission to export data]"))
@@ -1194,23 +1438,72 @@ class Listing(ListingBase):
                 headers = self.exported_headers(use_col_name)
                 if export_format == "DBF":
                     headers = list(map(lambda h: h[:10], headers))
-                data = tablib.Dataset(title=_("[Listing export]"))
-                data.headers = headers
                 keep_original_type = export_format in EXPORT_FORMATS_KEEP_ORIGINAL_TYPE
-                for row in self.exported_rows(keep_original_type):
-                    data.append(row)
-                export_params = {}
-                if export_format == "CSV":
-                    export_params["delimiter"] = ";"
-                self.request.export_data = data.export(
-                    export_format.lower(), **export_params
-                )
                 current_date = timezone.now().strftime("%Y-%m-%d.%Hh%M")
                 self.request.export_filename = "{}.{}.{}".format(
                     self.name, current_date, self.export.lower()
                 )
+                if self.export_streaming and export_format in EXPORT_FORMATS_STREAMING:
+                    self.request.export_data = self.exported_stream(
+                        export_format, headers, keep_original_type
+                    )
+                    self.request.export_content_type = EXPORT_FORMATS_STREAMING[
+                        export_format
+                    ]
+                elif self.export_in_background:
+                    user = getattr(self.request, "user", None)
+                    job = ExportJob(
+                        self.request.export_filename,
+                        user_id=getattr(user, "pk", None),
+                    )
+                    get_export_job_backend().submit(
+                        job,
+                        self.get_export_job_listing(),
+                        export_format,
+                        headers,
+                        keep_original_type,
+                        translation.get_language(),
+                    )
+                    self.request.export_data = job
+                else:
+                    self.request.export_data = self.exported_file_content(
+                        export_format, headers, keep_original_type
+                    )
         return hasattr(self.request, "export_data")
 
+    def get_export_job_listing(self):
+        """Copy of the listing given to a background export job
+
+        The job runs after the response while the request listing goes on
+        rendering : the copy has its own columns and records, data is the
+        filtered export data. The request is kept for exported values hooks.
+        """
+        listing = copy.copy(self)
+        if isinstance(self.data, QuerySet):
+            listing.data = self.records.filter_queryset(self.data)
+        else:
+            listing.data = list(self.records.filter_sequence(self.data))
+        listing.filters = None  # already applied to data
+        listing.records = self.records_class(listing)
+        listing.query_stats = None
+        listing.profiler = None
+        listing.__dict__.pop("_all_records", None)
+        columns_copies = {}
+        for col in self.columns:
+            columns_copies[col] = col_copy = copy.copy(col)
+            col_copy.set_listing(listing)
+        listing.columns = copy.copy(self.columns)
+        listing.columns[:] = [columns_copies[col] for col in self.columns]
+        listing.columns.name2col = {col.name: col for col in listing.columns}
+        listing.columns.listing = listing
+        for attr in ("selected_columns", "exported_columns"):
+            setattr(
+                listing,
+                attr,
+                [columns_copies.get(col, col) for col in getattr(self, attr)],
+            )
+        return listing
+
     def django_listing_info(self):
         if hasattr(self, "request"):
             if self.request.GET.get("__django_listing_info__"):
@@ -1227,16 +1520,35 @@ class Listing(ListingBase):
                 import sys
 
                 out += f"Python version : {sys.version.split()[0]}<br>"
+                if self.queryset_optimizations:
+                    out += "Queryset optimizations : {}<br>".format(
+                        escape(self.queryset_optimizations)
+                    )
                 return out
 
+    @track_phase("render_template")
     def render_template(self):
+        if self.cached_render is not None:
+            return self.cached_render
         request_for_info = self.django_listing_info()
-        if request_for_info:
-            return request_for_info
+        render_cache = self.render_cache_instance
+        if self.profiler is not None:
+            self.profiler.install()
         ctx = self.get_listing_context()
+        if render_cache:
+            ctx["csrf_token"] = RENDER_CACHE_CSRF_PLACEHOLDER
         template = loader.get_template(self.listing_template_name)
         # request is needed for context_processor processing
         out = template.render(ctx, request=self.request)
+        if render_cache:
+            return render_cache.set(out)
+        if request_for_info:
+            # the template has been rendered to have complete stats
+            self.stop_instrumentation()
+            for tracker in (self.query_stats, self.profiler):
+                if tracker is not None:
+                    request_for_info += tracker.as_html()
+            return request_for_info
         return out
 
     def get_listing_css_id(self):
@@ -1278,7 +1590,7 @@ class Listing(ListingBase):
         if self.selection_menu_id:
             ca.add("selection-menu-id", self.selection_menu_id)
         ca.add("attached-form-id", self.attached_form_css_id)
-        if self.paginator:
+        if self.paginator and self.paginator.count_is_exact:
             ca.add("nb-rows", self.paginator.count)
         if self.has_nb_unfiltered_rows:
             ca.add("nb-unfiltered-rows", self.records.get_unfiltered_count())
@@ -1329,6 +1641,17 @@ class Listing(ListingBase):
         if callable(method):
             method(self, records)
 
+    def invalidate(self):
+        """Forget cached sorts and filters of sequence data
+
+        To be called when the data given to a listing with sequence_cache
+        has been modified in place (or change sequence_version).
+        """
+        if not isinstance(self.data, QuerySet):
+            invalidate_sequence_engine(self, self.data)
+        self.records.__dict__.pop("_sequence_objs", None)
+
+    @track_phase("rows")
     def div_rows(self):
         for rec in self.records.current_page():
             self.rows_context_list.append(rec)
@@ -1346,6 +1669,7 @@ class Listing(ListingBase):
             self.aggregate(rec)
             yield row
 
+    @track_phase("rows")
     def rows(self):
         for rec in self.records.current_page():
             index = rec.get_index()
@@ -1380,6 +1704,9 @@ class Listing(ListingBase):
             value = cell_value_func(rec, keep_original_type)
         else:
             value = col.get_cell_exported_value(rec, keep_original_type)
+        return self.sanitize_exported_value(value)
+
+    def sanitize_exported_value(self, value):
         # Excel sanitization
         if isinstance(value, str):
             value = EXPORT_EXCEL_SANITIZE_RE.sub(" ", value)
@@ -1394,7 +1721,25 @@ class Listing(ListingBase):
     def exported_nb_rows(self):
         return self.records.export_count()
 
+    def get_db_value_exporter(self, col, keep_original_type):
+        if hasattr(self, f"exported_cell_value_{col.name}"):
+            return None
+        return col.get_db_value_exporter(keep_original_type)
+
     def exported_rows(self, keep_original_type=True):
+        columns = [c for c in self.exported_columns if c.exportable]
+        exporters = [self.get_db_value_exporter(c, keep_original_type) for c in columns]
+        values = None
+        if all(exporters):
+            values = self.records.export_values(columns)
+        if values is not None:
+            # fast path : no model instance nor Record created
+            sanitize = self.sanitize_exported_value
+            for row in values:
+                yield [
+                    sanitize(exporter(value)) for exporter, value in zip(exporters, row)
+                ]
+            return
         for rec in self.records.export():
             yield [
                 self.get_cell_exported_value(c, rec, keep_original_type)
@@ -1402,11 +1747,73 @@ class Listing(ListingBase):
                 if c.exportable
             ]
 
+    def exported_file_content(
+        self, export_format, headers, keep_original_type=True, progress=None
+    ):
+        if export_format == "JSONL":
+            # not a tablib format
+            return "".join(
+                self.exported_stream(
+                    export_format, headers, keep_original_type, progress
+                )
+            )
+        data = tablib.Dataset(title=_("[Listing export]"))
+        data.headers = headers
+        for i, row in enumerate(self.exported_rows(keep_original_type), 1):
+            data.append(row)
+            if progress and i % self.export_chunk_size == 0:
+                progress(i)
+        export_params = {}
+        if export_format == "CSV":
+            export_params["delimiter"] = ";"
+        return data.export(export_format.lower(), **export_params)
+
+    def exported_stream(
+        self, export_format, headers, keep_original_type=True, progress=None
+    ):
+        """Yield the export file by chunks of export_chunk_size rows
+
+        Consumed by StreamingHttpResponse, outside of queries tracking and
+        profiling.
+        """
+        buffer = io.StringIO()
+        if export_format == "JSONL":
+
+            def write_row(row):
+                buffer.write(
+                    json.dumps(
+                        dict(zip(headers, row)),
+                        cls=DjangoJSONEncoder,
+                        ensure_ascii=False,
+                    )
+                )
+                buffer.write("\n")
+
+        else:
+            delimiter = ";" if export_format == "CSV" else "\t"
+            write_row = csv.writer(buffer, delimiter=delimiter).writerow
+            write_row(headers)
+        for i, row in enumerate(self.exported_rows(keep_original_type), 1):
+            write_row(row)
+            if i % self.export_chunk_size == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+                if progress:
+                    progress(i)
+        yield buffer.getvalue()
+
     def get_rendered_cells(self, rec):
         rendered_columns = []
+        stats = self.query_stats
         for col in self.selected_columns:
+            if stats is None:
+                html = self.col_cell_renderers[col](rec)
+            else:
+                with stats.column(col.name):
+                    html = self.col_cell_renderers[col](rec)
             rendered_col = dict(
-                html=self.col_cell_renderers[col](rec),
+                html=html,
                 obj=col,
             )
             rendered_columns.append(rendered_col)
@@ -1449,6 +1856,7 @@ class Listing(ListingBase):
             styles.append(style)
         return styles
 
+    @track_phase("footer")
     def footer_columns(self):
         if self.has_footer:
             rendered_columns = []
@@ -1473,33 +1881,47 @@ class Listing(ListingBase):
         """Get listing url with some updated parameters if needed
         Note : Do not remove 'context=None' because needed by listing variations
         """
-        querystring = QueryDict(self.parsed_url.query, mutable=True)
-        if only_one_with_prefix:
-            del_keys = [
-                k for k in querystring.keys() if k.startswith(only_one_with_prefix)
-            ]
-            for k in del_keys:
-                del querystring[k]
+        params = {}
         for k, v in kwargs.items():
-            if not isinstance(v, str):
-                v = str(v)
             if k in LISTING_QUERY_STRING_KEYS:
                 k += self.suffix
-            querystring[k] = v
+            params[k] = v
         del_keys = LISTING_NOT_PERSISTENT_QUERY_STRING_KEYS - set(kwargs.keys())
         if without:
             if isinstance(without, str):
                 without = without.split(",")
             del_keys = del_keys | set(without)
-        for k in del_keys:
-            k += self.suffix
-            if k in querystring:
-                del querystring[k]
-        fragment = anchor_hash or self.anchor_hash
-        return urlunsplit(
-            self.parsed_url._replace(query=querystring.urlencode(), fragment=fragment)
+        return self.get_url_builder().get_url(
+            params,
+            {k + self.suffix for k in del_keys},
+            only_one_with_prefix,
+            anchor_hash or self.anchor_hash,
         )
 
+    def get_url_builder(self):
+        """Url builder of the current request url, the query is parsed once"""
+        builder = self._url_builder
+        if builder is None or builder.parsed_url is not self.parsed_url:
+            builder = self._url_builder = ListingURLBuilder(self.parsed_url)
+        return builder
+
+    def get_url_pattern(self, key, **kwargs):
+        """Listing url where the value of key parameter is given later
+
+        Use get_url_pattern(key, **kwargs).format(value) instead of
+        get_url(key=value, **kwargs) when only value changes, for example
+        in cell filter links. kwargs values must be hashable.
+        """
+        builder = self.get_url_builder()
+        pattern_key = (key, tuple(sorted(kwargs.items())))
+        pattern = builder.patterns.get(pattern_key)
+        if pattern is None:
+            pattern = builder.patterns[pattern_key] = ListingURLPattern(
+                self.get_url(**{key: URL_VALUE_PLACEHOLDER}, **kwargs),
+                builder.encoding,
+            )
+        return pattern
+
     def get_hiddens(self, without=None):
         hiddens = QueryDict(self.parsed_url.query, mutable=True)
         if self.filters and "f_do_filter" not in hiddens:
@@ -3,14 +3,32 @@
 #
 # @author: Eric Lapouyade
 #
+import base64
+import binascii
+import json
+import zlib
+from datetime import date, time
 
-from django.core.paginator import Paginator as DjangoPaginator, Page as DjangoPage
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.paginator import (
+    EmptyPage,
+    Page as DjangoPage,
+    PageNotAnInteger,
+    Paginator as DjangoPaginator,
+)
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.db.models.query import QuerySet
+from django.utils.functional import cached_property
 from django.utils.translation import pgettext_lazy, gettext
 
 from .context import RenderContext
+from .exceptions import InvalidListingConfiguration
 from .theme_config import ThemeAttribute, ThemeTemplate
+from .utils import get_estimated_count
 
 __all__ = [
+    "KeysetPaginator",
     "NoIconButtonPaginator",
     "NoIconButtonPaginatorMixin",
     "NoTextButtonPaginator",
@@ -18,7 +36,13 @@ __all__ = [
     "Paginator",
 ]
 
+# "exact" : use SELECT COUNT(*),
+# "estimated" : use database statistics when the table is big,
+# "has_next" : do not count, only fetch one more row to know if there is a next page
+COUNT_STRATEGIES = ("exact", "estimated", "has_next")
+
 PAGINATOR_PARAMS_KEYS = {
+    "estimated_count_min",
     "fast_page_next_tpl",
     "fast_page_prev_tpl",
     "fast_page_step",
@@ -34,11 +58,16 @@ PAGINATOR_PARAMS_KEYS = {
     "hide_disabled_buttons",
     "hide_single_page",
     "in_footer",
+    "page_info_estimated_tpl",
+    "page_info_no_count_tpl",
     "page_info_tpl",
     "page_row_tpl",
     "page_scale_ellipsis",
     "page_scale_size",
     "parts_order",
+    "row_info_estimated_tpl",
+    "row_info_no_count_tpl",
+    "row_info_tpl",
     "template_name",
     "theme_button_a_class",
     "theme_button_li_class",
@@ -63,8 +92,16 @@ class Paginator(DjangoPaginator):
     has_page_info = True
     has_editable_page_info = False
     page_info_tpl = pgettext_lazy("paginator", "Page {page_number} of {nb_pages}")
+    page_info_estimated_tpl = pgettext_lazy(
+        "paginator", "Page {page_number} of about {nb_pages}"
+    )
+    page_info_no_count_tpl = pgettext_lazy("paginator", "Page {page_number}")
     has_row_info = False
     row_info_tpl = pgettext_lazy("paginator", "{row_first}-{row_last} of {nb_rows}")
+    row_info_estimated_tpl = pgettext_lazy(
+        "paginator", "{row_first}-{row_last} of about {nb_rows}"
+    )
+    row_info_no_count_tpl = pgettext_lazy("paginator", "{row_first}-{row_last}")
     has_prev_next = True
     prev_text = pgettext_lazy("paginator", "Previous")
     next_text = pgettext_lazy("paginator", "Next")
@@ -86,6 +123,10 @@ class Paginator(DjangoPaginator):
     has_goto_page = False
     goto_page_tpl = pgettext_lazy("paginator", "Go to page {goto_form}")
     in_footer = False
+    # with "estimated" count strategy, smaller estimations are counted exactly
+    estimated_count_min = 10_000
+    # "exact", "estimated" or "lower_bound" (has_next count strategy)
+    count_accuracy = "exact"
 
     theme_first_last_has_icon = ThemeAttribute("paginator_theme_first_last_has_icon")
     theme_first_last_has_text = ThemeAttribute("paginator_theme_first_last_has_text")
@@ -108,6 +149,12 @@ class Paginator(DjangoPaginator):
     ):
         super().__init__(object_list, per_page, orphans, allow_empty_first_page)
         self.listing = listing
+        self.count_strategy = listing.count_strategy
+        if self.count_strategy not in COUNT_STRATEGIES:
+            raise InvalidListingConfiguration(
+                gettext("count_strategy must be one of: %s")
+                % ", ".join(COUNT_STRATEGIES)
+            )
         for k in PAGINATOR_PARAMS_KEYS:
             listing_key = "paginator_" + k
             if hasattr(listing, listing_key):
@@ -118,19 +165,84 @@ class Paginator(DjangoPaginator):
                 map(lambda s: s.split(","), self.parts_order.split(";"))
             )
 
+    @cached_property
+    def count(self):
+        if self.count_strategy == "estimated":
+            count = self.get_estimated_count()
+            if count is not None:
+                self.count_accuracy = "estimated"
+                return count
+        self.count_accuracy = "exact"
+        count = self.listing.records.get_exact_count()
+        if count is not None:
+            # counted with the footer global aggregations or prefetched
+            return count
+        return super().count
+
+    def get_estimated_count(self):
+        if not isinstance(self.object_list, QuerySet):
+            return None
+        count = get_estimated_count(self.object_list)
+        if count is None or count < self.estimated_count_min:
+            return None
+        return count
+
+    def set_exact_count(self):
+        if self.count_accuracy != "exact":
+            self.count_strategy = "exact"
+            self.__dict__.pop("count", None)
+            self.__dict__.pop("num_pages", None)
+
+    def set_lower_bound_count(self, bottom, objs, has_next=None):
+        """For has_next strategy : objs have been fetched with one more row"""
+        if has_next is None:
+            has_next = len(objs) > self.per_page
+        objs = objs[: self.per_page]
+        self.__dict__["count"] = bottom + len(objs) + int(has_next)
+        self.__dict__.pop("num_pages", None)
+        self.count_accuracy = "lower_bound"
+        return objs
+
+    @property
+    def count_is_exact(self):
+        return self.count_accuracy == "exact"
+
     def validate_number(self, number):
         if number == "last":
+            self.set_exact_count()
             number = self.num_pages
+        elif self.count_strategy == "has_next":
+            # Number of pages is unknown : do not check upper bound
+            try:
+                if isinstance(number, float) and not number.is_integer():
+                    raise ValueError
+                number = int(number)
+            except (TypeError, ValueError):
+                raise PageNotAnInteger(gettext("That page number is not an integer"))
+            if number < 1:
+                raise EmptyPage(gettext("That page number is less than 1"))
+            return number
         return super().validate_number(number)
 
-    def page(self, number):
-        """Return a Page object for the given 1-based page number."""
-        number = self.validate_number(number)
+    def get_page_bounds(self, number):
+        """Return bottom and top row indexes (0-based) for a page number"""
         bottom = (number - 1) * self.per_page
         top = bottom + self.per_page
-        if bottom > self.count - self.per_page:
+        if self.count_strategy == "estimated" and number >= self.num_pages:
+            # the last page needs the exact count
+            self.set_exact_count()
+            number = min(number, self.num_pages)
+            bottom = (number - 1) * self.per_page
+            top = bottom + self.per_page
+        if self.count_strategy != "has_next" and bottom > self.count - self.per_page:
             bottom = max(0, self.count - self.per_page)
             top = self.count
+        return number, bottom, top
+
+    def page(self, number):
+        """Return a Page object for the given 1-based page number."""
+        number = self.validate_number(number)
+        number, bottom, top = self.get_page_bounds(number)
         if bottom > self.listing.offset_max:
             self.listing.empty_table_msg = (
                 gettext(
@@ -140,11 +252,26 @@ class Paginator(DjangoPaginator):
                 % self.listing.offset_max
             )
             return Page([], number, self, bottom, top)
-        page = Page(self.object_list[bottom:top], number, self, bottom, top)
-        return page
+        if self.count_strategy == "has_next":
+            objs = list(self.object_list[bottom : top + 1])
+            if not objs and number > 1:
+                # page out of range : count rows to display the last page
+                self.set_exact_count()
+                return self.page(min(number, self.num_pages))
+            objs = self.set_lower_bound_count(bottom, objs)
+            return Page(objs, number, self, bottom, bottom + len(objs))
+        objs = self.object_list[bottom:top]
+        if self.count_accuracy == "estimated" and number > 1 and not objs:
+            # estimation was too high : count rows to display the last page
+            self.set_exact_count()
+            return self.page(min(number, self.num_pages))
+        return Page(objs, number, self, bottom, top)
+
+    def get_page_url(self, page):
+        return self.listing.get_url(page=page)
 
     def get_context(self):
-        get_url = self.listing.get_url
+        get_url = self.get_page_url
         page = self.listing.current_page
         fast_page_prev = max(1, page.number - self.fast_page_step)
         fast_page_next = min(self.num_pages, page.number + self.fast_page_step)
@@ -169,7 +296,7 @@ class Paginator(DjangoPaginator):
                     beginning_ellipsis_display = False
                 if scale_range_max == self.num_pages:
                     scale_range_min = max(1, self.num_pages - self.page_scale_size)
-                else:
+                elif self.count_accuracy != "lower_bound":
                     ending_ellipsis_range_min = max(
                         scale_range_max + 1,
                         self.num_pages - self.page_scale_ellipsis + 1,
@@ -211,6 +338,15 @@ class Paginator(DjangoPaginator):
             page_number = page.number
 
         nb_page_rows = page.end_index() - page.start_index() + 1
+        if self.count_accuracy == "lower_bound":
+            page_info_tpl = self.page_info_no_count_tpl
+            row_info_tpl = self.row_info_no_count_tpl
+        elif self.count_accuracy == "estimated":
+            page_info_tpl = self.page_info_estimated_tpl
+            row_info_tpl = self.row_info_estimated_tpl
+        else:
+            page_info_tpl = self.page_info_tpl
+            row_info_tpl = self.row_info_tpl
 
         return RenderContext(
             first_page_url=get_url(page=1),
@@ -237,10 +373,10 @@ class Paginator(DjangoPaginator):
             ending_ellipsis_pages=ending_ellipsis_pages,
             ending_ellipsis_display=ending_ellipsis_display,
             nb_page_rows=nb_page_rows,
-            page_info=self.page_info_tpl.format(
+            page_info=page_info_tpl.format(
                 page_number=page_number, nb_pages=self.num_pages
             ),
-            row_info=self.row_info_tpl.format(
+            row_info=row_info_tpl.format(
                 row_first=page.start_index(),
                 row_last=page.end_index(),
                 nb_rows=self.count,
@@ -288,6 +424,226 @@ class Page(DjangoPage):
         return self.number * self.paginator.per_page
 
 
+class KeysetPaginator(Paginator):
+    """Paginator using keyset (seek) pagination on querysets
+
+    Instead of using ``OFFSET n`` SQL, the next and previous pages are fetched
+    with a ``WHERE (sort_cols) > (last_values)`` condition built from the
+    listing ordering (the primary key is added as a tie-breaker). The values
+    are stored in an opaque cursor put in the url next to the page number.
+    The last page is fetched by reversing the ordering, so it is fast too.
+    Other pages (page scale, goto page...) still use an offset, and the
+    paginator falls back to the standard behaviour on sequences, on group by
+    listings, when the ordering contains expressions or when the cursor
+    does not match the actual ordering/per_page anymore. Keyset pagination
+    is not used when sorting on nullable fields or annotations, as rows with
+    NULL values cannot be compared.
+    """
+
+    def __init__(
+        self, listing, object_list, per_page, orphans=0, allow_empty_first_page=True
+    ):
+        self.keyset_order_by = None
+        self.keyset_fields = None
+        if isinstance(object_list, QuerySet) and not listing.gb_cols:
+            self.keyset_order_by = self.get_keyset_order_by(
+                object_list, listing.records.get_order_by()
+            )
+            if self.keyset_order_by:
+                object_list = object_list.order_by(*self.keyset_order_by)
+                self.keyset_fields = [
+                    self.get_order_field(object_list.model, o)
+                    for o in self.keyset_order_by
+                ]
+        super().__init__(
+            listing, object_list, per_page, orphans, allow_empty_first_page
+        )
+
+    @staticmethod
+    def get_keyset_order_by(qs, order_by):
+        order_by = list(order_by)
+        if not all(isinstance(o, str) and o and o != "?" for o in order_by):
+            return None
+        for o in order_by:
+            if KeysetPaginator.get_order_field(qs.model, o) is None:
+                return None
+        pk_names = {"pk", qs.model._meta.pk.name}
+        if not any(o.lstrip("-") in pk_names for o in order_by):
+            order_by.append("pk")
+        return order_by
+
+    @staticmethod
+    def get_order_field(model, order):
+        """Model field of an order_by item, None if it cannot be used for keyset
+
+        Annotations, nullable fields (or through nullable relations) and
+        relations to models having a default ordering cannot be used.
+        """
+        field = None
+        for name in order.lstrip("-").split("__"):
+            if model is None:
+                return None
+            try:
+                field = model._meta.pk if name == "pk" else model._meta.get_field(name)
+            except FieldDoesNotExist:
+                return None  # may be an annotation
+            nullable = getattr(field, "null", True)
+            if nullable or not getattr(field, "concrete", False):
+                return None
+            if not field.is_relation:
+                return field
+            model = field.related_model
+        if model is None or model._meta.ordering:
+            # Django would sort on the related model default ordering
+            return None
+        return field
+
+    def get_signature(self):
+        signature = "{}|{}".format(",".join(self.keyset_order_by), self.per_page)
+        return format(zlib.crc32(signature.encode()), "x")
+
+    def encode_cursor(self, number, bottom, values, before=False):
+        # not DjangoJSONEncoder : datetimes must keep their microseconds
+        values = [
+            v.isoformat() if isinstance(v, (date, time)) else v for v in values
+        ]
+        data = {"n": number, "i": bottom, "s": self.get_signature(), "v": values}
+        if before:
+            data["b"] = 1
+        data = json.dumps(data, cls=DjangoJSONEncoder, separators=(",", ":"))
+        return base64.urlsafe_b64encode(data.encode()).decode().rstrip("=")
+
+    def decode_cursor(self, cursor):
+        if not isinstance(cursor, str) or not cursor:
+            return None
+        try:
+            data = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+            data = json.loads(data)
+        except (binascii.Error, ValueError):
+            return None
+        if (
+            not isinstance(data, dict)
+            or data.get("s") != self.get_signature()
+            or not isinstance(data.get("i"), int)
+            or not isinstance(data.get("v"), list)
+            or len(data["v"]) != len(self.keyset_order_by)
+        ):
+            return None
+        try:
+            data["v"] = [
+                field.to_python(v) for field, v in zip(self.keyset_fields, data["v"])
+            ]
+        except ValidationError:
+            return None
+        return data
+
+    @staticmethod
+    def get_obj_value(obj, key):
+        for subkey in key.split("__"):
+            if obj is None:
+                return None
+            if isinstance(obj, dict):
+                obj = obj.get(subkey)
+            else:
+                obj = getattr(obj, subkey, None)
+        if hasattr(obj, "pk"):  # case it is a model object
+            obj = obj.pk
+        return obj
+
+    def get_obj_values(self, obj):
+        return [self.get_obj_value(obj, o.lstrip("-")) for o in self.keyset_order_by]
+
+    def get_reversed_order_by(self):
+        return [o[1:] if o.startswith("-") else "-" + o for o in self.keyset_order_by]
+
+    def get_keyset_filter(self, values, before=False):
+        q = Q()
+        for i, order in enumerate(self.keyset_order_by):
+            descending = order.startswith("-")
+            lookup = "lt" if descending != before else "gt"
+            condition = Q(**{f"{order.lstrip('-')}__{lookup}": values[i]})
+            for prev_order, prev_value in zip(self.keyset_order_by[:i], values[:i]):
+                condition &= Q(**{prev_order.lstrip("-"): prev_value})
+            q |= condition
+        return q
+
+    def get_keyset_objects(self, values, before=False, extra_row=False):
+        qs = self.object_list.filter(self.get_keyset_filter(values, before))
+        if before:
+            objs = list(qs.order_by(*self.get_reversed_order_by())[: self.per_page])
+            objs.reverse()
+        else:
+            objs = list(qs[: self.per_page + int(extra_row)])
+        return objs
+
+    def get_last_objects(self):
+        qs = self.object_list.order_by(*self.get_reversed_order_by())
+        objs = list(qs[: self.per_page])
+        objs.reverse()
+        return objs
+
+    def page(self, number):
+        if not self.keyset_order_by:
+            return super().page(number)
+        number = self.validate_number(number)
+        has_next_only = self.count_strategy == "has_next"
+        cursor = self.decode_cursor(self.listing.cursor)
+        if (
+            cursor
+            and cursor.get("n") == number
+            and None not in cursor["v"]  # NULL values cannot be compared
+        ):
+            before = bool(cursor.get("b"))
+            objs = self.get_keyset_objects(cursor["v"], before, has_next_only)
+            bottom = max(0, cursor["i"])
+            if has_next_only:
+                # when going backward, we come from the next page
+                objs = self.set_lower_bound_count(bottom, objs, before or None)
+        elif not has_next_only:
+            number, bottom, top = self.get_page_bounds(number)
+            if number > 1 and number == self.num_pages:
+                objs = self.get_last_objects()
+            else:
+                return super().page(number)
+        else:
+            return super().page(number)
+        return Page(objs, number, self, bottom, bottom + len(objs))
+
+    def get_page_cursor(self, page, before=False):
+        objs = page.object_list
+        if not objs:
+            return None
+        if not isinstance(objs, list):
+            objs = page.object_list = list(objs)
+        values = self.get_obj_values(objs[0] if before else objs[-1])
+        if None in values:
+            return None
+        if before:
+            number = page.number - 1
+            bottom = page.start_index() - 1 - self.per_page
+        else:
+            number = page.number + 1
+            bottom = page.end_index()
+        return self.encode_cursor(number, bottom, values, before)
+
+    def get_page_url(self, page):
+        current_page = self.listing.current_page
+        if self.keyset_order_by and current_page is not None:
+            cursor = None
+            if page == current_page.number + 1 and (
+                page < self.num_pages or self.count_strategy == "has_next"
+            ):
+                cursor = self.get_page_cursor(current_page)
+            elif (
+                page == current_page.number - 1
+                and current_page.start_index() - 1 > self.per_page
+            ):
+                cursor = self.get_page_cursor(current_page, before=True)
+            if cursor:
+                return self.listing.get_url(page=page, cursor=cursor)
+        return self.listing.get_url(page=page, without="cursor")
+
+
 class NoTextButtonPaginatorMixin:
     theme_first_last_has_text = False
     theme_fast_page_has_text = False
@@ -3,35 +3,151 @@
 #
 # @author: Eric Lapouyade
 #
+import asyncio
 import base64
 import collections
+import functools
+import logging
 import os
 import re
 import types
+from operator import attrgetter, itemgetter
 from urllib.parse import quote_plus
 
+from asgiref.sync import sync_to_async
 from django.core.exceptions import FieldDoesNotExist
 from django.core.serializers.json import Serializer
 from django.db import models
-from django.db.models import F, Model
+from django.db.models import Count, F, Model
 from django.db.models.query import QuerySet
 from django.utils.safestring import mark_safe
 from django.utils.translation import gettext as _
 
 from . import FILTER_QUERYSTRING_PREFIX
+from .aggregations import Aggregation
 from .exceptions import *
-from .utils import to_js_timestamp
+from .utils import get_estimated_count, to_js_timestamp
+
+logger = logging.getLogger("django_listing")
 
 __all__ = [
     "RecordManager",
     "Record",
+    "RecordAccessor",
     "cache_in_record",
+    "get_record_accessor",
     "object_serializer",
     "FORM_LABEL_METHOD_NAME",
 ]
 
 
 FORM_LABEL_METHOD_NAME = "get_form_label"
+RECORD_ACCESSORS_CACHE_SIZE = 4096
+CELL_VALUE_NOT_CACHED = object()
+RECORD_GET_EXCEPTIONS = (
+    IndexError,
+    AttributeError,
+    TypeError,
+    KeyError,
+    models.ObjectDoesNotExist,
+)
+
+
+def get_object_filter(filter_name, params):
+    """Compile a Record.get() key filter into a function taking the object"""
+    if filter_name == "urlencode":
+        return lambda obj: quote_plus(obj) if isinstance(obj, str) else obj
+    if filter_name == "replace":
+        return lambda obj: obj.replace(*params)
+    if filter_name == "sub":
+        if len(params) == 2:
+            regex = re.compile(params[0])
+            repl = params[1]
+            return lambda obj: regex.sub(repl, obj)
+        return lambda obj: re.sub(*params, obj)
+    if filter_name == "basename":
+        return os.path.basename
+    if filter_name == "js_timestamp":
+        return to_js_timestamp
+
+    def call_method(obj):
+        func = getattr(obj, filter_name, None)
+        if func is not None:
+            obj = func()
+        return obj
+
+    return call_method
+
+
+def get_attr_getter(name):
+    if "." in name:
+        # attrgetter() would follow the dotted path : keep getattr() behaviour
+        return lambda obj: getattr(obj, name)
+    return attrgetter(name)
+
+
+class RecordAccessor:
+    """
+    Compiled Record.get() key : "attr__subattr__0|filter:param1:param2"
+
+    Each "__" separated step is a getter : digits are indexes, names are read
+    as dict items or object attributes depending on the object, methods found
+    on the way are called. On a dict record, the whole path is first tried as
+    a key (case group by / values()). The optional filter is applied if the
+    value is not None. Use get_record_accessor() to benefit from the accessors
+    cache.
+    """
+
+    __slots__ = ("key", "path", "steps", "filter_func")
+
+    def __init__(self, key):
+        self.key = key
+        self.path = None
+        self.filter_func = None
+        if not isinstance(key, str):
+            self.steps = ((None, itemgetter(key)),)
+            return
+        path, *filter_names = key.split("|", 1)
+        self.path = path
+        self.steps = tuple(
+            (None, itemgetter(int(subkey)))
+            if subkey.isdigit()
+            else (get_attr_getter(subkey), itemgetter(subkey))
+            for subkey in path.split("__")
+        )
+        if filter_names:
+            filter_name, *params = re.split(r"(?<!\\):", filter_names[0])
+            params = tuple(map(lambda s: s.replace("\\:", ":"), params))
+            self.filter_func = get_object_filter(filter_name, params)
+
+    def __call__(self, obj):
+        if isinstance(obj, dict) and self.path in obj:
+            obj = obj[self.path]
+        else:
+            for attr_getter, item_getter in self.steps:
+                if attr_getter is None or isinstance(obj, dict):
+                    obj = item_getter(obj)
+                else:
+                    obj = attr_getter(obj)
+                if isinstance(obj, types.MethodType):
+                    obj = obj()
+        if obj is not None and self.filter_func is not None:
+            obj = self.filter_func(obj)
+        return obj
+
+    def get(self, obj, default=None):
+        # case obj is a dict, try without splitting key (case group by)
+        if isinstance(obj, dict) and self.key in obj:
+            return obj[self.key]
+        try:
+            return self(obj)
+        except RECORD_GET_EXCEPTIONS:
+            return default
+
+
+@functools.lru_cache(maxsize=RECORD_ACCESSORS_CACHE_SIZE)
+def get_record_accessor(key):
+    return RecordAccessor(key)
 
 
 def cache_in_record(value_func):
@@ -81,6 +197,11 @@ class RecordManager:
     def __init__(self, listing):
         self.listing = listing
         self._records = None
+        self._global_aggregates = None
+        self._prefetched_count = None
+        self._prefetched_page = None
+        # set by Listing.arender() to compute the page after aprefetch()
+        self.defer_page_records = False
 
     def get_all(self):
         # used only for sequences (and short sequences please !)
@@ -96,6 +217,15 @@ class RecordManager:
             lsg._all_records = [Record(lsg, rec, i) for i, rec in enumerate(lsg.data)]
         return lsg._all_records
 
+    def iter_all(self):
+        """Same records as get_all() without keeping them in memory"""
+        lsg = self.listing
+        if hasattr(lsg, "_all_records") or isinstance(lsg.data, QuerySet):
+            yield from self.get_all()
+        else:
+            for i, rec in enumerate(lsg.data):
+                yield Record(lsg, rec, i)
+
     def get_first_obj(self):
         if not hasattr(self, "_first_obj"):
             qs = self.get_objs_from_queryset()
@@ -131,9 +261,138 @@ class RecordManager:
                 return None
             return self.get_objs_from_sequence()[pk].obj
 
+    def get_global_aggregates_exprs(self):
+        """Returns (expressions, aliases) of the global aggregations query
+
+        aliases maps an expression name to (column name, aggregate key).
+        """
+        lsg = self.listing
+        exprs = {}
+        aliases = {}
+        if not lsg.has_footer or not isinstance(lsg.data, QuerySet):
+            return exprs, aliases
+        for i, col in enumerate(lsg.selected_columns):
+            agg = col.aggregation
+            if not isinstance(agg, Aggregation) or not agg.global_aggregation:
+                continue
+            if isinstance(col.data_key, str):
+                _, prefetch_path, _ = self.get_data_key_lookups(
+                    lsg.data.model, col.data_key
+                )
+                if prefetch_path:
+                    # joining a multi-valued relation would duplicate rows
+                    continue
+            for key, expr in (agg.get_queryset_aggregates() or {}).items():
+                # column names may not be valid SQL aliases
+                alias = f"agg{i}_{key}"
+                exprs[alias] = expr
+                aliases[alias] = (col.name, key)
+        if exprs and not lsg.gb_cols:
+            # the paginator count comes from the same query
+            exprs["nb_rows"] = Count("pk")
+        return exprs, aliases
+
+    def set_global_aggregates(self, result, aliases):
+        self._global_aggregates = {}
+        if "nb_rows" in result:
+            self._global_aggregates[None] = result.pop("nb_rows")
+        for alias, value in result.items():
+            name, key = aliases[alias]
+            self._global_aggregates.setdefault(name, {})[key] = value
+
+    def get_global_aggregates(self):
+        """Global aggregations of the selected columns computed in one query
+
+        Returns a dict column name -> aggregates (see
+        Aggregation.get_queryset_aggregates()), the filtered rows count is
+        under the None key. Computed once per request.
+        """
+        if self._global_aggregates is None:
+            exprs, aliases = self.get_global_aggregates_exprs()
+            result = {}
+            if exprs:
+                result = self.get_filtered_queryset().aggregate(**exprs)
+            self.set_global_aggregates(result, aliases)
+        return self._global_aggregates
+
+    def get_exact_count(self):
+        """Filtered rows count if already known, None otherwise"""
+        if self._prefetched_count is not None:
+            return self._prefetched_count
+        return self.get_global_aggregates().get(None)
+
+    async def aprefetch(self):
+        """Fetch with django async ORM what the current page rendering needs
+
+        The rows count (or the global aggregations query giving it) and the
+        current page rows are fetched concurrently, as well as foreign key
+        filters choices. compute_current_page_records() then uses them.
+        """
+        from .filters import ForeignKeyFilter
+        from .paginators import Paginator
+
+        lsg = self.listing
+        if not isinstance(lsg.data, QuerySet) or lsg.gb_cols:
+            return
+        qs = await sync_to_async(self.get_objs_from_queryset)()
+        exprs, aliases = await sync_to_async(self.get_global_aggregates_exprs)()
+        tasks = []
+        if exprs:
+            tasks.append(self.aaggregate(exprs, aliases))
+        elif lsg.count_strategy == "exact":
+            tasks.append(self.acount(qs))
+        if lsg.paginator_class.page is Paginator.page and lsg.count_strategy == "exact":
+            bounds = self.get_page_bounds()
+            if bounds is not None:
+                tasks.append(self.afetch_page(qs, *bounds))
+        for filtr in lsg.filters or []:
+            if isinstance(filtr, ForeignKeyFilter):
+                tasks.append(sync_to_async(filtr.get_choices_mode)())
+        await asyncio.gather(*tasks)
+
+    async def aaggregate(self, exprs, aliases):
+        result = await self.get_filtered_queryset().aaggregate(**exprs)
+        self.set_global_aggregates(result, aliases)
+
+    async def acount(self, qs):
+        self._prefetched_count = await qs.acount()
+
+    async def afetch_page(self, qs, bottom, top):
+        self._prefetched_page = (bottom, top, [obj async for obj in qs[bottom:top]])
+
+    def prefetch(self):
+        """Run the current page queries now (ListingViewMixin.concurrent_listings)"""
+        lsg = self.listing
+        if lsg.cached_render is not None:
+            return
+        lsg.compute_current_page_records()
+        if isinstance(lsg.data, QuerySet) and not lsg.gb_cols:
+            self.get_global_aggregates()
+        page = lsg.current_page
+        if isinstance(page.object_list, QuerySet):
+            page.object_list = list(page.object_list)
+
+    def get_page_bounds(self):
+        """bottom and top rows indexes of the requested page if it is a number"""
+        lsg = self.listing
+        try:
+            number = int(lsg.page or 1)
+        except (TypeError, ValueError):
+            return None
+        per_page = self.get_per_page()
+        bottom = (number - 1) * per_page
+        if number < 1 or bottom > lsg.offset_max:
+            return None
+        return bottom, bottom + per_page
+
     def get_unfiltered_count(self):
         data = self.listing.data
         if isinstance(data, QuerySet):
+            paginator = self.listing.paginator
+            if paginator and self.listing.count_strategy != "exact":
+                count = get_estimated_count(data)
+                if count is not None and count >= paginator.estimated_count_min:
+                    return count
             return data.count()
         else:
             return len(data)
@@ -168,7 +427,16 @@ class RecordManager:
             obj.save()
             self.clear_first_last_cache()
 
+    def get_per_page(self):
+        lsg = self.listing
+        per_page = int(lsg.per_page)
+        if per_page <= 0 or per_page > lsg.per_page_max:
+            per_page = lsg.per_page_max
+        return per_page
+
     def compute_current_page_records(self):
+        if self.defer_page_records:
+            return
         lsg = self.listing
         if not isinstance(lsg.data, (collections.abc.Sequence, QuerySet)):
             raise InvalidData(_("Listing data must be a sequence or a QuerySet."))
@@ -177,13 +445,18 @@ class RecordManager:
         else:
             objs = self.get_objs_from_sequence()
 
-        per_page = int(lsg.per_page)
-        if per_page <= 0 or per_page > lsg.per_page_max:
-            per_page = lsg.per_page_max
+        per_page = self.get_per_page()
         lsg.paginator = lsg.paginator_class(
             lsg, objs, per_page, lsg.orphans, lsg.allow_empty_first_page
         )
         lsg.current_page = lsg.paginator.get_page(lsg.page or 1)
+        if self._prefetched_page is not None:
+            bottom, top, page_objs = self._prefetched_page
+            page = lsg.current_page
+            # the prefetched rows are not the page ones if it has been clamped
+            same_bounds = (page._bottom, page._top) == (bottom, top)
+            if same_bounds and isinstance(page.object_list, QuerySet):
+                page.object_list = page_objs
         if lsg.editable and lsg.editing:
             self.bind_formset()
 
@@ -244,6 +517,11 @@ class RecordManager:
 
     def export(self):
         lsg = self.listing
+        if not isinstance(lsg.data, QuerySet):
+            # same filtering and ordering as displayed pages
+            for i, item in enumerate(self.get_objs_from_sequence()):
+                yield Record(lsg, item, i)
+            return
         export_data = self.get_export_data()
         export_data = self.order_data(export_data)
         if lsg.gb_cols:
@@ -252,13 +530,49 @@ class RecordManager:
             for rec in records:
                 yield rec
         else:
+            if isinstance(export_data, QuerySet):
+                # do not load the whole queryset in memory
+                export_data = export_data.iterator(chunk_size=lsg.export_chunk_size)
             for i, obj in enumerate(export_data):
                 yield Record(lsg, obj, i)
 
+    def export_values(self, columns):
+        """Exported data as tuples of the columns data_key values
+
+        Returns None when model instances are needed : data is not a queryset,
+        group by is active or a data_key is not a plain field lookup.
+        """
+        lsg = self.listing
+        if lsg.gb_cols or not isinstance(lsg.data, QuerySet):
+            return None
+        data_keys = []
+        for col in columns:
+            data_key = col.data_key
+            if not isinstance(data_key, str) or "|" in data_key:
+                return None
+            select_path, prefetch_path, field_path = self.get_data_key_lookups(
+                lsg.data.model, data_key
+            )
+            # a data_key ending on a relation is displayed as an object
+            if field_path != data_key or prefetch_path or select_path == field_path:
+                return None
+            data_keys.append(data_key)
+        export_data = self.order_data(self.get_export_data())
+        if export_data.query.combinator:
+            return None
+        return (
+            export_data.prefetch_related(None)
+            .values_list(*data_keys)
+            .iterator(chunk_size=lsg.export_chunk_size)
+        )
+
     def get_export_data(self):
         data = self.listing.data
         if isinstance(data, QuerySet):
             export_data = self.filter_queryset(data)
+            export_data = self.optimize_queryset(
+                export_data, self.listing.exported_columns
+            )
         else:
             export_data = self.filter_sequence(data)
         return export_data
@@ -268,7 +582,7 @@ class RecordManager:
         if isinstance(export_data, QuerySet):
             return export_data.count()
         else:
-            return len(export_data)
+            return len(self.get_objs_from_sequence())
 
     def filter_queryset(self, qs):
         if self.listing.filters:
@@ -319,24 +633,163 @@ class RecordManager:
         order_by = self.get_order_by()
         return qs.order_by(*order_by)
 
+    def get_sequence_sort_keys(self):
+        """(sort_key, ascending) list to sort sequence data, for pages and exports"""
+        lsg = self.listing
+        sort_keys = []
+        if lsg.force_order_by:
+            order_by = lsg.force_order_by
+            if isinstance(order_by, str):
+                order_by = (order_by,)
+            for sort_key in order_by:
+                if sort_key.startswith("-"):
+                    sort_keys.append((sort_key[1:], False))
+                else:
+                    sort_keys.append((sort_key, True))
+        elif lsg.sort:
+            for col_name in lsg.columns_sort_list:
+                col = lsg.columns.get(col_name)
+                if col:
+                    ascending = lsg.columns_sort_ascending[col_name]
+                    if isinstance(col.sort_key, (tuple, list)):
+                        sort_keys.extend((k, ascending) for k in col.sort_key)
+                    else:
+                        sort_keys.append((col.sort_key, ascending))
+        return sort_keys
+
     def order_sequence(self, data):
-        # only manage one level sort
-        order_by = self.get_order_by()
-        if order_by:
-            sort_key = order_by[0]
-            sort_desc = sort_key[0] == "-"
-            if sort_desc:
-                sort_key = sort_key[1:]
-            data = sorted(data, key=lambda x: x[sort_key], reverse=sort_desc)
-        return data
+        from .sequence_engines import sort_sequence
+
+        return sort_sequence(data, self.get_sequence_sort_keys())
 
     def get_objs_from_queryset(self):
         if not hasattr(self, "_queryset_objs"):
             qs = self.get_filtered_queryset()
             qs = self.order_queryset(qs)
+            qs = self.optimize_queryset(qs, self.listing.selected_columns)
             self._queryset_objs = qs
         return self._queryset_objs
 
+    @staticmethod
+    def get_data_key_lookups(model, data_key):
+        """Return (select_related path, prefetch_related path, field path)
+
+        for a column data_key like "company__name" : the field path is None
+        when the key does not end on a model field (property, method...).
+        """
+        key = data_key.split("|", 1)[0]
+        names = key.split("__")
+        select_names = []
+        for i, name in enumerate(names):
+            try:
+                field = model._meta.get_field(name)
+            except FieldDoesNotExist:
+                break
+            path = "__".join(names[: i + 1])
+            if not field.is_relation:
+                return "__".join(select_names), None, path
+            if name != field.name and name == getattr(field, "attname", None):
+                # foreign key id (ex: company_id) : no need to join the relation
+                if i < len(names) - 1:
+                    break
+                field_path = "__".join(names[:i] + [field.name])
+                return "__".join(select_names), None, field_path
+            if field.related_model is None:  # GenericForeignKey
+                break
+            if field.many_to_many or field.one_to_many:
+                return "__".join(select_names), path, None
+            select_names.append(name)
+            model = field.related_model
+            if i == len(names) - 1:
+                return path, None, path
+        return "__".join(select_names), None, None
+
+    def optimize_queryset(self, qs, columns):
+        """Add select_related() and prefetch_related() needed by columns
+
+        With listing.optimize_queryset_only, the fields not used by the columns
+        are not loaded at all (.only()). What has been added is available in
+        listing.queryset_optimizations for debugging purposes.
+        """
+        lsg = self.listing
+        if (
+            not lsg.optimize_queryset
+            or not columns
+            or lsg.gb_cols
+            or qs.query.values_select
+            or qs.query.deferred_loading != (frozenset(), True)
+        ):
+            return qs
+        select_related = set()
+        prefetch_related = set()
+        only = set()
+        # .only() is used only if all the values read by columns are known
+        only_possible = True
+        object_paths = set()  # relations displayed as objects (str())
+        data_keys = []
+        for col in columns:
+            if isinstance(col.data_key, str) and not callable(col.cell_value):
+                data_keys.append(col.data_key)
+            else:
+                only_possible = False
+        if lsg.selectable and isinstance(lsg.selection_key, str):
+            data_keys.append(lsg.selection_key)
+        for data_key in data_keys:
+            select_path, prefetch_path, field_path = self.get_data_key_lookups(
+                qs.model, data_key
+            )
+            if select_path:
+                select_related.add(select_path)
+                if select_path == field_path:
+                    object_paths.add(select_path)
+            if prefetch_path:
+                prefetch_related.add(prefetch_path)
+            if field_path:
+                only.add(field_path)
+            elif not prefetch_path:
+                # property, method... : may read any field, avoid N+1 queries
+                only_possible = False
+        # avoid to defer fields of related objects that are displayed as objects
+        only = {
+            path
+            for path in only
+            if not any(path.startswith(obj + "__") for obj in object_paths)
+        }
+        # relations traversed by select_related() must not be deferred
+        for path in select_related:
+            names = path.split("__")
+            only.update("__".join(names[: i + 1]) for i in range(len(names)))
+        # select_related() paths that are prefixes of others are useless
+        select_related = {
+            path
+            for path in select_related
+            if not any(p.startswith(path + "__") for p in select_related)
+        }
+        lsg.queryset_optimizations = {
+            "select_related": sorted(select_related),
+            "prefetch_related": sorted(prefetch_related),
+            "only": [],
+        }
+        if select_related:
+            qs = qs.select_related(*sorted(select_related))
+        if prefetch_related:
+            qs = qs.prefetch_related(*sorted(prefetch_related))
+        if (
+            lsg.optimize_queryset_only
+            and only_possible
+            and only
+            and not lsg.editable
+            and not lsg.attached_form
+        ):
+            lsg.queryset_optimizations["only"] = sorted(only)
+            qs = qs.only(*sorted(only))
+        logger.debug(
+            "%s queryset optimizations : %s",
+            lsg.__class__.__name__,
+            lsg.queryset_optimizations,
+        )
+        return qs
+
     def filter_sequence(self, seq):
         if self.listing.filters:
             for filtr in self.listing.filters:
@@ -344,30 +797,43 @@ class RecordManager:
         return seq
 
     def get_objs_from_sequence(self):
-        lsg = self.listing
-        seq = self.listing.data
-        seq = self.filter_sequence(seq)
-        if lsg.sort:
-            for col_name in reversed(lsg.columns_sort_list):
-                col = lsg.columns.get(col_name)
-                if col:
-                    sort_key = col.sort_key
-                    if callable(sort_key):
-                        key_func = sort_key
-                    else:
-
-                        def key_func(rec):
-                            return rec[sort_key]
+        """Filtered and sorted sequence, see Listing.sequence_engine"""
+        from .sequence_engines import (
+            get_engine_class,
+            get_sequence_engine,
+            uses_sequence_predicates,
+        )
 
-                    seq = sorted(
-                        seq,
-                        key=key_func,
-                        reverse=not lsg.columns_sort_ascending[col_name],
-                    )
-        return [SequenceItem(i, obj) for i, obj in enumerate(seq)]
+        lsg = self.listing
+        if not hasattr(self, "_sequence_objs"):
+            filters = list(lsg.filters) if lsg.filters else []
+            sort_keys = self.get_sequence_sort_keys()
+            if uses_sequence_predicates(filters):
+                engine = get_sequence_engine(lsg, lsg.data)
+            else:
+                # filtered data is different on each request : not cached
+                engine_class = get_engine_class(lsg.sequence_engine)
+                engine = engine_class(list(self.filter_sequence(lsg.data)))
+                filters = []
+            self._sequence_objs = engine.get_view(filters, sort_keys)
+        return self._sequence_objs
 
 
 class Record:
+    # Records are created for every row : format context, page position and
+    # cell values cache are only computed on first use
+    __slots__ = (
+        "_listing",
+        "_obj",
+        "pk",
+        "_index",
+        "_cell_values",
+        "_form",
+        "_selected",
+        "_format_ctx",
+        "_page_position",
+    )
+
     def __init__(self, listing, obj, index=0, form=None):
         self._listing = listing
         if isinstance(obj, SequenceItem):
@@ -376,27 +842,26 @@ class Record:
         else:
             self._obj = obj
         self._index = index
-        self._cell_values = {}
+        self._cell_values = None
         self._form = form
         self._selected = False
-        self._is_qs_first = False
-        self._is_qs_last = False
-        self._qs_record_index = 0
-        if isinstance(self._obj, dict):
-            self._format_ctx = self._obj
-        elif isinstance(self._obj, (tuple, list)):
-            self._format_ctx = {
-                self._listing.columns[i].name: val for i, val in enumerate(self._obj)
-            }
-        else:
-            self._format_ctx = vars(self._obj)
-        cp = listing.current_page
-        if cp:
-            self._qs_record_index = cp.start_index() + index  # 1-based index
-            if self._qs_record_index == 1:
-                self._is_qs_first = True
-            if self._qs_record_index == cp.paginator.count:
-                self._is_qs_last = True
+        self._format_ctx = None
+        self._page_position = None
+
+    def get_page_position(self):
+        """Returns (1-based index in queryset, is first, is last)"""
+        if self._page_position is None:
+            cp = self._listing.current_page
+            if cp:
+                qs_record_index = cp.start_index() + self._index
+                self._page_position = (
+                    qs_record_index,
+                    qs_record_index == 1,
+                    not cp.has_next() and qs_record_index == cp.paginator.count,
+                )
+            else:
+                self._page_position = (0, False, False)
+        return self._page_position
 
     def get_object(self):
         return self._obj
@@ -481,10 +946,10 @@ class Record:
         return base64.b64encode(serialized_obj.encode()).decode()
 
     def is_first_qs_record(self):
-        return self._is_qs_first
+        return self.get_page_position()[1]
 
     def is_last_qs_record(self):
-        return self._is_qs_last
+        return self.get_page_position()[2]
 
     def is_selected(self):
         return self._selected
@@ -499,18 +964,38 @@ class Record:
         self._form = form
 
     def get_cached_cell_value(self, col):
-        if col in self._cell_values:
-            return True, self._cell_values[col]
+        # cell values are stored by column position (see Column.cell_value_index)
+        index = getattr(col, "cell_value_index", None)
+        if self._cell_values is not None and index is not None:
+            value = self._cell_values[index]
+            if value is not CELL_VALUE_NOT_CACHED:
+                return True, value
         return False, None
 
     def set_cached_cell_value(self, col, value):
-        self._cell_values[col] = value
+        index = getattr(col, "cell_value_index", None)
+        if index is not None:
+            if self._cell_values is None:
+                self._cell_values = [CELL_VALUE_NOT_CACHED] * len(
+                    self._listing.columns
+                )
+            self._cell_values[index] = value
 
     def get_format_ctx(self):
+        if self._format_ctx is None:
+            obj = self._obj
+            if isinstance(obj, dict):
+                self._format_ctx = obj
+            elif isinstance(obj, (tuple, list)):
+                self._format_ctx = {
+                    self._listing.columns[i].name: val for i, val in enumerate(obj)
+                }
+            else:
+                self._format_ctx = vars(obj)
         return self._format_ctx
 
     def format_str(self, str_to_format, extra_context=None):
-        context = {**self._format_ctx}
+        context = {**self.get_format_ctx()}
         obj = self.get_object()
         context.update(rec_object=obj)
         if hasattr(obj, "get_absolute_url"):
@@ -524,21 +1009,7 @@ class Record:
         return self._index
 
     def do_filter_object(self, obj, filter_name, params):
-        if filter_name == "urlencode" and isinstance(obj, str):
-            obj = quote_plus(obj)
-        elif filter_name == "replace":
-            obj = obj.replace(*params)
-        elif filter_name == "sub":
-            obj = re.sub(*params, obj)
-        elif filter_name == "basename":
-            obj = os.path.basename(obj)
-        elif filter_name == "js_timestamp":
-            obj = to_js_timestamp(obj)
-        else:
-            func = getattr(obj, filter_name, None)
-            if func is not None:
-                obj = func()
-        return obj
+        return get_object_filter(filter_name, params)(obj)
 
     def get_href(self):
         if hasattr(self._obj, "get_absolute_url"):
@@ -555,41 +1026,10 @@ class Record:
         return self._listing.get_url(**kwargs)
 
     def get(self, key, default=None):
-        obj = self._obj
-        # case obj is a dict, try without splitting key (case group by)
-        if isinstance(obj, dict) and key in obj:
-            return obj.get(key)
-        try:
-            if isinstance(key, int):
-                obj = obj[key]
-            else:
-                key, *filter_names = key.split("|", 1)
-                for subkey in key.split("__"):
-                    if "|" in subkey:
-                        subkey, *filter_names = subkey.split("|", 1)
-                    if subkey.isdigit():
-                        obj = obj[int(subkey)]
-                    else:
-                        if isinstance(obj, dict):
-                            obj = obj[subkey]
-                        else:
-                            obj = getattr(obj, subkey)
-                    if isinstance(obj, types.MethodType):
-                        obj = obj()
-                if obj is not None and filter_names:
-                    filter_names = filter_names[0]
-                    filter_name, *params = re.split(r"(?<!\\):", filter_names)
-                    params = tuple(map(lambda s: re.sub(r"\\:", ":", s), params))
-                    obj = self.do_filter_object(obj, filter_name, params)
-        except (
-            IndexError,
-            AttributeError,
-            TypeError,
-            KeyError,
-            models.ObjectDoesNotExist,
-        ):
-            return default
-        return obj
+        return get_record_accessor(key).get(self._obj, default)
+
+    def get_by_accessor(self, accessor, default=None):
+        return accessor.get(self._obj, default)
 
     def _digest(self):
         out = ""
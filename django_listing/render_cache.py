@@ -0,0 +1,221 @@
+#
+# Created : 2026-10-17
+#
+# @author: Eric Lapouyade
+#
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import EmptyResultSet, FieldError
+from django.db.models import Max, Model
+from django.db.models.query import QuerySet
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.http import QueryDict
+from django.middleware.csrf import get_token as get_csrf_token
+from django.utils import translation
+
+from .exceptions import InvalidListingConfiguration
+
+__all__ = [
+    "RENDER_CACHE_CSRF_PLACEHOLDER",
+    "RenderCache",
+    "get_model_version",
+    "watch_model_changes",
+]
+
+RENDER_CACHE_KEY = "django_listing_render:{}"
+RENDER_CACHE_VERSION_KEY = "django_listing_render_version:{}"
+# rendered with this csrf token, replaced by the real one when served
+RENDER_CACHE_CSRF_PLACEHOLDER = "__django_listing_csrf_token__"
+RENDER_CACHE_INVALIDATIONS = ("ttl", "version", "probe")
+
+watched_models = set()
+
+
+def get_cache():
+    return caches[settings.django_listing_settings.RENDER_CACHE]
+
+
+def get_model_version_key(model):
+    return RENDER_CACHE_VERSION_KEY.format(model._meta.label_lower)
+
+
+def bump_model_version(sender, **kwargs):
+    cache = get_cache()
+    key = get_model_version_key(sender)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), None)
+
+
+def watch_model_changes(*models):
+    """Bump models version on any write to invalidate caches depending on them
+
+    Used by listings in "version" mode and by foreign key filters choices.
+    Models are connected on first use : call this in an AppConfig.ready()
+    to be sure all processes modifying these models invalidate caches.
+    """
+    for model in models:
+        if model in watched_models:
+            continue
+        watched_models.add(model)
+        uid = "django_listing_render_cache_" + model._meta.label_lower
+        post_save.connect(bump_model_version, sender=model, dispatch_uid=uid)
+        post_delete.connect(bump_model_version, sender=model, dispatch_uid=uid)
+        for field in model._meta.many_to_many:
+            m2m_changed.connect(
+                lambda sender, instance, **kwargs: bump_model_version(type(instance)),
+                sender=field.remote_field.through,
+                dispatch_uid=uid + "_" + field.name,
+                weak=False,
+            )
+
+
+def get_model_version(model):
+    watch_model_changes(model)
+    cache = get_cache()
+    key = get_model_version_key(model)
+    version = cache.get(key)
+    if version is None:
+        version = time.time_ns()
+        if not cache.add(key, version, None):
+            version = cache.get(key)
+    return version
+
+
+def normalize_value(value):
+    if isinstance(value, Model):
+        return value.pk
+    if isinstance(value, QuerySet):
+        return sorted(value.values_list("pk", flat=True))
+    if isinstance(value, dict):
+        return sorted((k, normalize_value(v)) for k, v in value.items())
+    if isinstance(value, (list, tuple, set)):
+        return [normalize_value(v) for v in value]
+    return value
+
+
+class RenderCache:
+    """Cache the listing rendered HTML in django cache (RENDER_CACHE setting)
+
+    The key is built from the request path and query string (cached links
+    are built from them), the listing class, the normalized listing
+    parameters, the filters cleaned data, the data queryset SQL, the theme,
+    the language and the user permissions : override get_key_parts() if
+    the rendering depends on something else (ex: the user itself).
+    Listing.render_cache_invalidation selects how cached renderings are
+    invalidated before Listing.render_cache_timeout :
+
+    - "ttl" : not invalidated
+    - "version" : post_save/post_delete signals on the listing model
+      and render_cache_models bump a version stored in the cache
+    - "probe" : a MAX(render_cache_probe_field) query on the same models
+    """
+
+    def __init__(self, listing):
+        self.listing = listing
+        self.key = self.get_key() if self.is_cacheable() else None
+
+    def is_cacheable(self):
+        listing = self.listing
+        request = listing.request
+        return (
+            isinstance(listing.data, QuerySet)
+            and not listing.action
+            and not listing.can_edit
+            and not listing.processed_pks
+            and not listing.row_form_errors
+            and (request.method in ("GET", "HEAD") or listing.ajax_request)
+        )
+
+    def get_models(self):
+        return [self.listing.model] + list(self.listing.render_cache_models or [])
+
+    def get_user_permissions(self):
+        user = getattr(self.listing.request, "user", None)
+        if user is None or not user.is_authenticated:
+            return None
+        if user.is_superuser:
+            return "superuser"
+        return sorted(user.get_all_permissions())
+
+    def get_key_parts(self):
+        from .listing import LISTING_QUERY_STRING_KEYS
+
+        listing = self.listing
+        filters_data = listing.filters.get_cleaned_data() if listing.filters else None
+        parsed_url = listing.parsed_url
+        return [
+            parsed_url.path if parsed_url else None,
+            sorted(QueryDict(parsed_url.query).lists()) if parsed_url else None,
+            listing.__class__.__module__,
+            listing.__class__.__qualname__,
+            listing.name,
+            listing.suffix,
+            listing.ajax_part if listing.ajax_request else None,
+            [(k, getattr(listing, k, None)) for k in sorted(LISTING_QUERY_STRING_KEYS)],
+            normalize_value(filters_data),
+            str(listing.data.query),
+            str(settings.django_listing_settings.THEME),
+            translation.get_language(),
+            self.get_user_permissions(),
+            self.get_invalidation_token(),
+        ]
+
+    def get_key(self):
+        try:
+            parts = repr(self.get_key_parts())
+        except EmptyResultSet:  # queryset SQL cannot be built : not cached
+            return None
+        return RENDER_CACHE_KEY.format(hashlib.sha256(parts.encode()).hexdigest())
+
+    def get_invalidation_token(self):
+        invalidation = self.listing.render_cache_invalidation
+        if invalidation not in RENDER_CACHE_INVALIDATIONS:
+            raise InvalidListingConfiguration(
+                f'render_cache_invalidation "{invalidation}" is not valid, '
+                f"possible values : {', '.join(RENDER_CACHE_INVALIDATIONS)}"
+            )
+        return getattr(self, f"get_{invalidation}_token")()
+
+    def get_ttl_token(self):
+        return None
+
+    def get_version_token(self):
+        return [get_model_version(model) for model in self.get_models()]
+
+    def get_probe_token(self):
+        field = self.listing.render_cache_probe_field
+        try:
+            return [
+                model._default_manager.aggregate(val=Max(field)).get("val")
+                for model in self.get_models()
+            ]
+        except FieldError as e:
+            raise InvalidListingConfiguration(
+                f'render_cache_probe_field "{field}" cannot be used for "probe" '
+                f"render cache invalidation : {e}"
+            ) from e
+
+    def get(self):
+        if self.key is None:
+            return None
+        out = get_cache().get(self.key)
+        if out is not None:
+            out = self.restore_csrf_token(out)
+        return out
+
+    def set(self, out):
+        if self.key is not None:
+            get_cache().set(self.key, out, self.listing.render_cache_timeout)
+        return self.restore_csrf_token(out)
+
+    def restore_csrf_token(self, out):
+        if RENDER_CACHE_CSRF_PLACEHOLDER in out:
+            out = out.replace(
+                RENDER_CACHE_CSRF_PLACEHOLDER, get_csrf_token(self.listing.request)
+            )
+        return out
@@ -0,0 +1,370 @@
+#
+# Created : 2026-10-17
+#
+# @author: Eric Lapouyade
+#
+import collections
+import threading
+
+from django.conf import settings
+from django.utils.translation import gettext as _
+
+from .exceptions import InvalidListingConfiguration
+from .filters import Filter
+from .record import SequenceItem, get_record_accessor
+
+try:
+    import numpy
+except ImportError:  # numpy is optional
+    numpy = None
+
+__all__ = [
+    "NumpySequenceEngine",
+    "PythonSequenceEngine",
+    "SequenceEngine",
+    "SequenceView",
+    "get_sequence_engine",
+    "invalidate_sequence_engine",
+    "sort_sequence",
+]
+
+
+class ReversedKey:
+    """Compare ascending sort keys the other way round to sort descending
+
+    Descending keys are all wrapped : a ReversedKey is only compared to
+    another one, whatever the wrapped values are.
+    """
+
+    __slots__ = ("key",)
+
+    def __init__(self, key):
+        self.key = key
+
+    def __lt__(self, other):
+        return other.key < self.key
+
+    def __gt__(self, other):
+        return other.key > self.key
+
+    def __eq__(self, other):
+        return self.key == other.key
+
+
+def get_sort_key(value, ascending):
+    """Composite sort key part : None values are first ascending, last descending"""
+    key = (0,) if value is None else (1, value)
+    return key if ascending else ReversedKey(key)
+
+
+def get_hashable_value(value):
+    """Filter value usable in a cache key (ex: list of values for "in" lookups)"""
+    if isinstance(value, (list, tuple)):
+        return tuple(map(get_hashable_value, value))
+    if isinstance(value, (set, frozenset)):
+        return frozenset(map(get_hashable_value, value))
+    if isinstance(value, dict):
+        return frozenset((k, get_hashable_value(v)) for k, v in value.items())
+    try:
+        hash(value)
+    except TypeError:
+        return repr(value)
+    return value
+
+
+class SequenceView(collections.abc.Sequence):
+    """Filtered and sorted rows of a sequence given to the paginator
+
+    Rows are wrapped into SequenceItem only when accessed, that is only for
+    the displayed page.
+    """
+
+    def __init__(self, rows, indices):
+        self.rows = rows
+        self.indices = indices
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            start, stop, step = item.indices(len(self.indices))
+            return [
+                SequenceItem(i, self.rows[self.indices[i]])
+                for i in range(start, stop, step)
+            ]
+        if item < 0:
+            item += len(self.indices)
+        return SequenceItem(item, self.rows[self.indices[item]])
+
+
+class SequenceEngine:
+    """Filter and sort sequence data on row indices
+
+    The sequence is ingested once : values of a data_key are extracted on
+    first use and kept as long as the engine, so engines can be reused across
+    requests with Listing.sequence_cache if the data is not modified in place.
+    Filtered and sorted indices are kept in a LRU cache of
+    SEQUENCE_INDICES_CACHE_SIZE entries per engine. Values and indices
+    sorted on callable sort keys are not cached : callables may be created
+    for each listing instance.
+    """
+
+    def __init__(self, data):
+        self.rows = data if isinstance(data, (list, tuple)) else list(data)
+        self.values = {}
+        self.sort_values = {}
+        self.indices_cache = collections.OrderedDict()
+        self.lock = threading.Lock()
+
+    def get_cached_indices(self, key):
+        with self.lock:
+            indices = self.indices_cache.get(key)
+            if indices is not None:
+                self.indices_cache.move_to_end(key)
+        return indices
+
+    def set_cached_indices(self, key, indices):
+        cache_size = settings.django_listing_settings.SEQUENCE_INDICES_CACHE_SIZE
+        with self.lock:
+            self.indices_cache[key] = indices
+            while len(self.indices_cache) > cache_size:
+                self.indices_cache.popitem(last=False)
+
+    def get_values(self, key):
+        """Values of row[key] as used by filters"""
+        values = self.values.get(key)
+        if values is None:
+            values = self.make_array([row[key] for row in self.rows])
+            with self.lock:
+                self.values[key] = values
+        return values
+
+    def get_sort_values(self, sort_key):
+        """Values of the sort key, sort_key is a data_key or a callable"""
+        if callable(sort_key):
+            return self.make_array([sort_key(row) for row in self.rows])
+        values = self.sort_values.get(sort_key)
+        if values is None:
+            key_func = get_record_accessor(sort_key)
+            values = self.make_array([key_func(row) for row in self.rows])
+            with self.lock:
+                self.sort_values[sort_key] = values
+        return values
+
+    def make_array(self, values):
+        return values
+
+    def all_indices(self):
+        return list(range(len(self.rows)))
+
+    def filter(self, indices, key, lookup, value, predicate):
+        raise NotImplementedError
+
+    def sort(self, indices, sort_keys):
+        """sort_keys is a list of (sort_key, ascending), the first one first"""
+        raise NotImplementedError
+
+    def get_filtered_indices(self, filters):
+        predicates = []
+        for filtr in filters:
+            sequence_predicate = filtr.get_sequence_predicate()
+            if sequence_predicate is not None:
+                predicates.append((*sequence_predicate, filtr.value))
+        filters_spec = tuple(
+            (key, lookup, get_hashable_value(value))
+            for key, lookup, _, value in predicates
+        )
+        indices = self.get_cached_indices(filters_spec)
+        if indices is None:
+            indices = self.all_indices()
+            for key, lookup, predicate, value in predicates:
+                indices = self.filter(indices, key, lookup, value, predicate)
+            self.set_cached_indices(filters_spec, indices)
+        return filters_spec, indices
+
+    def get_view(self, filters, sort_keys):
+        filters_spec, indices = self.get_filtered_indices(filters)
+        if sort_keys:
+            if any(callable(sort_key) for sort_key, _ in sort_keys):
+                return SequenceView(self.rows, self.sort(indices, sort_keys))
+            sort_spec = (filters_spec, tuple(sort_keys))
+            sorted_indices = self.get_cached_indices(sort_spec)
+            if sorted_indices is None:
+                sorted_indices = self.sort(indices, sort_keys)
+                self.set_cached_indices(sort_spec, sorted_indices)
+            indices = sorted_indices
+        return SequenceView(self.rows, indices)
+
+
+class PythonSequenceEngine(SequenceEngine):
+    def filter(self, indices, key, lookup, value, predicate):
+        values = self.get_values(key)
+        return [i for i in indices if predicate(values[i])]
+
+    def sort(self, indices, sort_keys):
+        # one stable sort on composite keys, whatever the number of sort keys
+        keys = [
+            [get_sort_key(values[i], ascending) for i in indices]
+            for values, ascending in (
+                (self.get_sort_values(sort_key), ascending)
+                for sort_key, ascending in sort_keys
+            )
+        ]
+        keys = keys[0] if len(keys) == 1 else list(zip(*keys))
+        return [indices[j] for j in sorted(range(len(keys)), key=keys.__getitem__)]
+
+
+class NumpySequenceEngine(PythonSequenceEngine):
+    """Columnar engine : filters are boolean masks and sorting a single lexsort
+
+    Only string columns are filtered with numpy vectorized operations, numeric
+    and sortable string columns are sorted with numpy.lexsort(). Other
+    columns (objects, None values...) fall back to PythonSequenceEngine.
+    """
+
+    vectorized_lookups = {
+        "equal": lambda values, value: values == value,
+        "contains": lambda values, value: numpy.char.find(values, value) >= 0,
+        "icontains": lambda values, value: (
+            numpy.char.find(numpy.char.lower(values), value.lower()) >= 0
+        ),
+        "lt": lambda values, value: values < value,
+        "lte": lambda values, value: values <= value,
+        "gt": lambda values, value: values > value,
+        "gte": lambda values, value: values >= value,
+    }
+
+    def make_array(self, values):
+        try:
+            array = numpy.asarray(values)
+        except (ValueError, TypeError):
+            array = None
+        # numpy would convert mixed numbers and strings to strings
+        if array is None or (
+            array.dtype.kind == "U" and not all(isinstance(v, str) for v in values)
+        ):
+            array = numpy.empty(len(values), dtype=object)
+            array[:] = values
+        return array
+
+    def all_indices(self):
+        return numpy.arange(len(self.rows))
+
+    def filter(self, indices, key, lookup, value, predicate):
+        values = self.get_values(key)[indices]
+        vectorized = self.vectorized_lookups.get(lookup)
+        if (
+            vectorized is not None
+            and values.dtype.kind == "U"
+            and isinstance(value, str)
+        ):
+            mask = vectorized(values, value)
+        else:
+            mask = numpy.fromiter(
+                (bool(predicate(v)) for v in values), dtype=bool, count=len(values)
+            )
+        return indices[mask]
+
+    def get_sort_array(self, sort_key, indices, ascending):
+        values = self.get_sort_values(sort_key)
+        kind = values.dtype.kind
+        if kind in "biu":
+            values = values[indices].astype(numpy.int64)
+        elif kind == "f":
+            values = values[indices]
+        elif kind == "U":
+            # ranks of strings so that they can be reversed
+            values = numpy.unique(values[indices], return_inverse=True)[1]
+        else:
+            return None
+        return values if ascending else -values
+
+    def sort(self, indices, sort_keys):
+        keys = []
+        for sort_key, ascending in sort_keys:
+            sort_array = self.get_sort_array(sort_key, indices, ascending)
+            if sort_array is None:
+                return numpy.asarray(super().sort(indices, sort_keys))
+            keys.append(sort_array)
+        # numpy.lexsort() is stable and sorts on the last key first
+        return indices[numpy.lexsort(keys[::-1])]
+
+
+SEQUENCE_ENGINES = {
+    "python": PythonSequenceEngine,
+    "numpy": NumpySequenceEngine,
+}
+
+engines_cache = collections.OrderedDict()
+engines_cache_lock = threading.Lock()
+
+
+def get_engine_class(name):
+    engine_class = SEQUENCE_ENGINES.get(name)
+    if engine_class is None:
+        raise InvalidListingConfiguration(
+            _("sequence_engine must be one of: %s") % ", ".join(SEQUENCE_ENGINES)
+        )
+    if engine_class is NumpySequenceEngine and numpy is None:
+        raise InvalidListingConfiguration(
+            _('sequence_engine "numpy" needs numpy to be installed')
+        )
+    return engine_class
+
+
+def get_engine_key(listing, data):
+    if listing.sequence_version is not None:
+        return ("version", listing.sequence_version)
+    return (id(data), len(data))
+
+
+def get_sequence_engine(listing, data):
+    """Engine for listing sequence data, kept across requests if sequence_cache
+
+    Engines are found back by Listing.sequence_version if set, otherwise by
+    the data object itself.
+    """
+    engine_class = get_engine_class(listing.sequence_engine)
+    if not listing.sequence_cache:
+        return engine_class(data)
+    key = get_engine_key(listing, data) + (engine_class,)
+    with engines_cache_lock:
+        cached = engines_cache.get(key)
+        if cached is not None and (
+            cached[0] is data or listing.sequence_version is not None
+        ):
+            engines_cache.move_to_end(key)
+            return cached[1]
+    engine = engine_class(data)
+    cache_size = settings.django_listing_settings.SEQUENCE_CACHE_SIZE
+    with engines_cache_lock:
+        # keep a reference on data so that its id is not reused
+        engines_cache[key] = (data, engine)
+        while len(engines_cache) > cache_size:
+            engines_cache.popitem(last=False)
+    return engine
+
+
+def invalidate_sequence_engine(listing, data):
+    """Forget ingested data and cached indices of a listing sequence data"""
+    key = get_engine_key(listing, data)
+    with engines_cache_lock:
+        for engine_key in [k for k in engines_cache if k[:-1] == key]:
+            del engines_cache[engine_key]
+
+
+def sort_sequence(data, sort_keys):
+    """Sort data rows on a list of (sort_key, ascending)"""
+    engine = PythonSequenceEngine(data)
+    if not sort_keys:
+        return engine.rows
+    indices = engine.sort(range(len(engine.rows)), sort_keys)
+    return [engine.rows[i] for i in indices]
+
+
+def uses_sequence_predicates(filters):
+    """False if a filter has its own filter_sequence() implementation"""
+    return all(
+        type(filtr).filter_sequence is Filter.filter_sequence for filtr in filters
+    )
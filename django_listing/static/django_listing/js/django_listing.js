@@ -1207,7 +1207,11 @@ $(document).ready(function () {
 
         function follow_file_generation() {
             const status = Cookies.get('file_generation');
-            if (status !== 'done') {
+            if (status && status.startsWith('job-')) {
+                // export is done in background : poll the job until file is ready
+                Cookies.set('file_generation', 'working', {expires: 1});
+                follow_export_job(status.substring(4));
+            } else if (status !== 'done') {
                 setTimeout(follow_file_generation, 300);
             } else {
                 Cookies.remove('file_generation');
@@ -1217,6 +1221,29 @@ $(document).ready(function () {
                 );
             }
         }
+
+        function follow_export_job(job_id) {
+            const job_url = window.location.pathname + "?djlst_export_job=" + encodeURIComponent(job_id);
+            $.getJSON(job_url, function(job) {
+                listing_div.attr("export-progress", job.progress);
+                $(document).trigger("djlst_file_generation_progress",
+                    {listing: $listing_div, job: job}
+                );
+                if (job.status === "done") {
+                    window.location.href = job_url + "&download=1";
+                    follow_file_generation();
+                } else if (job.status === "error") {
+                    Cookies.remove('file_generation');
+                    $('.spinning').removeClass('spinning');
+                    alert(job.error);
+                } else {
+                    setTimeout(function() { follow_export_job(job_id); }, 1000);
+                }
+            }).fail(function() {
+                Cookies.remove('file_generation');
+                $('.spinning').removeClass('spinning');
+            });
+        }
         follow_file_generation();
     });
 
@@ -79,6 +79,6 @@ djlst_deactivate_selection);$(document.body).on("click","li.action-item.view-obj
 e.searchParams.forEach(function(f,g){g.startsWith("f_")&&e.searchParams.delete(g)});window.location.href=e.toString()});$(".django-listing-container").each(function(){djlst_selection_changed_hook($(this))});$(document.body).on("click",".apply-group-by",function(){djlst_load_listing_url($(this),null)});$(document.body).on("click",".remove-group-by",function(){$(this).closest("div.django-listing-ajax").find(".group-by-container select").val("");let d=djlst_get_requested_url($(this));d=djlst_removeUrlParam(d,
 ["sort","page","per_page"]);djlst_load_listing_url($(this),d)});$('[data-toggle="popover"]').popover();var c=0;$(".dropzone").on("dragenter",function(){c++;$(this).addClass("drag-over")});$(".dropzone").bind("dragleave",function(){c--;0===c&&$(this).removeClass("drag-over")});$(".dropzone").bind("drop",function(){c=0;$(this).removeClass("drag-over")});$(document.body).on("click",".submit-action-form",function(){var d=$(this).val(),e=$(this).closest(".django-listing-container").find(".action-form");
 e.find(".action-hidden-value").val(d);e.submit()});$(document).on("select2:open",function(d){d=$(d.target).parent().find(".select2-selection").attr("aria-owns");document.querySelector('input[aria-controls="'+d+'"]')&&(document.querySelector('input[aria-controls="'+d+'"]').focus(),b=!0)});$("form").keyup(function(d){9==d.keyCode&&(d=$(d.target),d.hasClass("select2-selection")?(b||d.closest(".select2").siblings("select").first().select2("open"),b=!0):b=!1)});$('form.attached-form input[type="text"], form.attached-form input[type="number"]').on("keypress",
-function(d){if(13===d.which)return d.preventDefault(),$(this).blur().focus(),!1});$(document.body).on("click",".file-generation-button",function(){function d(){"done"!==Cookies.get("file_generation")?setTimeout(d,300):(Cookies.remove("file_generation"),$(".spinning").removeClass("spinning").addClass("done"),$(document).trigger("djlst_after_file_generation",{listing:g,filter_data:k,payload:h}))}var e=$(this),f=$(this).siblings("select");if(f.length&&!f.val())return(f=$(this).data("empty-select-msg"))||
-(f="Please select a value !"),alert(f),!1;f=$(this).closest("form");const g=f.closest(".django-listing-container"),k=djlst_add_filter_request_data(g,e,{});e=djlst_get_requested_url(e).split("?")[1];(e=(new URLSearchParams(e)).get("sort"))&&(k.sort=e);e=f.serializeArray();let h={};$.each(e,function(n,m){h[m.name]=m.value});$(document).trigger("djlst_before_file_generation",{listing:g,filter_data:k,payload:h});djlst_patch_form_data(f,k);Cookies.set("file_generation","working",{expires:1});$(this).closest("div.django-listing-ajax").addClass("spinning").removeClass("done");
+function(d){if(13===d.which)return d.preventDefault(),$(this).blur().focus(),!1});$(document.body).on("click",".file-generation-button",function(){function d(){const l=Cookies.get("file_generation");l&&l.startsWith("job-")?(Cookies.set("file_generation","working",{expires:1}),p(l.substring(4))):"done"!==l?setTimeout(d,300):(Cookies.remove("file_generation"),$(".spinning").removeClass("spinning").addClass("done"),$(document).trigger("djlst_after_file_generation",{listing:g,filter_data:k,payload:h}))}function p(l){const q=window.location.pathname+"?djlst_export_job="+encodeURIComponent(l);$.getJSON(q,function(r){t.attr("export-progress",r.progress);$(document).trigger("djlst_file_generation_progress",{listing:g,job:r});"done"===r.status?(window.location.href=q+"&download=1",d()):"error"===r.status?(Cookies.remove("file_generation"),$(".spinning").removeClass("spinning"),alert(r.error)):setTimeout(function(){p(l)},1E3)}).fail(function(){Cookies.remove("file_generation");$(".spinning").removeClass("spinning")})}var e=$(this),f=$(this).siblings("select");if(f.length&&!f.val())return(f=$(this).data("empty-select-msg"))||
+(f="Please select a value !"),alert(f),!1;f=$(this).closest("form");const g=f.closest(".django-listing-container"),k=djlst_add_filter_request_data(g,e,{});e=djlst_get_requested_url(e).split("?")[1];(e=(new URLSearchParams(e)).get("sort"))&&(k.sort=e);e=f.serializeArray();let h={};$.each(e,function(n,m){h[m.name]=m.value});$(document).trigger("djlst_before_file_generation",{listing:g,filter_data:k,payload:h});djlst_patch_form_data(f,k);Cookies.set("file_generation","working",{expires:1});const t=$(this).closest("div.django-listing-ajax");t.addClass("spinning").removeClass("done");
 d()});$(".attached-form-container.sticky .attached-form").length&&($(window).on("scroll resize",()=>a(!1)),$(document).on("djlst_selection_changed djlst_form_filled",()=>a(!0)));djlst_listing_on_load()});
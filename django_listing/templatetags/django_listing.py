@@ -201,6 +201,12 @@ def geturl_listing_key(context, listing, key, value, **kwargs):
     return mark_safe(listing.get_url(context, **{key: value}, **kwargs))
 
 
+@register.simple_tag()
+def geturl_listing_pattern(listing, key, **kwargs):
+    """url with URL_VALUE_PLACEHOLDER to be replaced by the key parameter value"""
+    return mark_safe(listing.get_url_pattern(key, **kwargs))
+
+
 @register.simple_tag()
 def gethiddens_listing(listing, without=None):
     return mark_safe(listing.get_hiddens_html(without))
@@ -119,6 +119,70 @@ class ThemeConfigBase(metaclass=ThemeConfigMeta):
     # fmt: on
 
 
+class ThemeResolution:
+    """Theme attributes values and templates paths, computed once per theme
+
+    Templates existing in the theme directory are listed once, so that
+    choosing between the theme and the fallback directory does not hit the
+    filesystem at each rendering.
+    """
+
+    def __init__(self, theme_config):
+        self.theme_config = theme_config
+        self.attrs = {
+            name: getattr(theme_config, name)
+            for name in dir(theme_config)
+            if not name.startswith("__")
+        }
+        self.theme_dir = self.get_theme_dir(theme_config.theme_name)
+        self.fallback_dir = self.get_theme_dir(theme_config.theme_fallback_name)
+        full_theme_dir = os.path.join(
+            settings.django_listing_settings.path, "templates", self.theme_dir
+        )
+        self.theme_templates = set()
+        for root, dirs, files in os.walk(full_theme_dir):
+            for filename in files:
+                self.theme_templates.add(
+                    os.path.relpath(os.path.join(root, filename), full_theme_dir)
+                )
+        self.templates = {}
+
+    @staticmethod
+    def get_theme_dir(theme_name):
+        return os.path.join(settings.django_listing_settings.name, theme_name)
+
+    def get_attr(self, attrname):
+        try:
+            return self.attrs[attrname]
+        except KeyError:
+            config = self.theme_config
+            raise InvalidListingConfiguration(
+                f"{attrname} does not exist in "
+                f"{config.__module__}.{config.__qualname__}"
+            )
+
+    def get_template(self, template_name):
+        path = self.templates.get(template_name)
+        if path is None:
+            if os.path.normpath(template_name) in self.theme_templates:
+                path = os.path.join(self.theme_dir, template_name)
+            else:
+                path = os.path.join(self.fallback_dir, template_name)
+            self.templates[template_name] = path
+        return path
+
+
+theme_resolutions = {}
+
+
+def get_theme_resolution(theme_config, reload=False):
+    """Resolution of a theme config class, computed on first use or if reload"""
+    resolution = theme_resolutions.get(theme_config)
+    if resolution is None or reload:
+        resolution = theme_resolutions[theme_config] = ThemeResolution(theme_config)
+    return resolution
+
+
 class ThemeAttribute:
     # This is a descriptor to dynamically get theme information
     # to come : read session to enable user to change theme on-the-fly
@@ -126,14 +190,9 @@ class ThemeAttribute:
         self.attrname = attrname
 
     def __get__(self, obj, objtype):
-        try:
-            # TODO : change this line to get the right theme_config from a theme name given by user
-            config = settings.django_listing_settings.theme_config
-            return getattr(config, self.attrname)
-        except AttributeError as e:
-            raise InvalidListingConfiguration(
-                f"{self.attrname} does not exist in {config.__module__}.{config.__qualname__}"
-            )
+        return settings.django_listing_settings.theme_resolution.get_attr(
+            self.attrname
+        )
 
 
 class ThemeTemplate(str):
@@ -144,23 +203,9 @@ class ThemeTemplate(str):
 
     @classmethod
     def get(cls, template_name):
-        path = os.path.join(
-            settings.django_listing_settings.name,
-            settings.django_listing_settings.theme_config.theme_name,
-            template_name,
-        )
-        full_path = os.path.join(
-            settings.django_listing_settings.path,
-            "templates",
-            path,
+        return settings.django_listing_settings.theme_resolution.get_template(
+            template_name
         )
-        if not os.path.exists(full_path):
-            path = os.path.join(
-                settings.django_listing_settings.name,
-                settings.django_listing_settings.theme_config.theme_fallback_name,
-                template_name,
-            )
-        return path
 
     def __get__(self, obj, objtype):
         return self.get(self.template_name)
@@ -0,0 +1,91 @@
+#
+# Created : 2026-10-17
+#
+# @author: Eric Lapouyade
+#
+from urllib.parse import quote_plus, urlencode, urlunsplit
+
+from django.http import QueryDict
+
+__all__ = [
+    "URL_VALUE_PLACEHOLDER",
+    "ListingURLBuilder",
+    "ListingURLPattern",
+]
+
+# url encoded as is : can be replaced by the url encoded value of a parameter
+URL_VALUE_PLACEHOLDER = "__djlst_url_value__"
+
+
+class ListingURLBuilder:
+    """Build urls from the request url by patching only the modified parameters
+
+    The request query string is parsed and url encoded once : the result is
+    the same as updating a QueryDict of the request query string and calling
+    its urlencode() method.
+    """
+
+    def __init__(self, parsed_url):
+        self.parsed_url = parsed_url
+        base_query = QueryDict(parsed_url.query)
+        self.encoding = base_query.encoding
+        # (key, url encoded values) in the QueryDict order
+        self.encoded_query = tuple(
+            (k, "&".join(self.encode(k, v) for v in values))
+            for k, values in base_query.lists()
+        )
+        self.base_url = urlunsplit(parsed_url._replace(query="", fragment=""))
+        self.patterns = {}
+
+    def encode(self, key, value):
+        return urlencode(
+            {key.encode(self.encoding): str(value).encode(self.encoding)}
+        )
+
+    def get_url(self, params=None, del_keys=(), del_prefix=None, fragment=None):
+        """Request url with params set, del_keys and del_prefix* keys removed
+
+        Keys removed with del_prefix can be set again by params, they are
+        then at the end of the query string. del_keys have priority on params.
+        """
+        params = params or {}
+        query = []
+        done = set()
+        for k, encoded in self.encoded_query:
+            if del_prefix and k.startswith(del_prefix):
+                continue
+            if k in params:
+                done.add(k)
+                if k not in del_keys:
+                    query.append(self.encode(k, params[k]))
+            elif k not in del_keys:
+                query.append(encoded)
+        for k, v in params.items():
+            if k not in done and k not in del_keys:
+                query.append(self.encode(k, v))
+        url = self.base_url
+        if query:
+            url += "?" + "&".join(query)
+        if fragment:
+            url += "#" + fragment
+        return url
+
+
+class ListingURLPattern:
+    """Url where the value of one parameter is filled in by string substitution
+
+    str() gives the url with URL_VALUE_PLACEHOLDER, for instance to be
+    replaced on template or javascript side.
+    """
+
+    def __init__(self, url, encoding):
+        self.url = url
+        self.encoding = encoding
+
+    def format(self, value):
+        return self.url.replace(
+            URL_VALUE_PLACEHOLDER, quote_plus(str(value).encode(self.encoding))
+        )
+
+    def __str__(self):
+        return self.url
@@ -4,10 +4,12 @@
 # @author: Eric Lapouyade
 #
 import copy
+import json
 import pprint
 from datetime import datetime, date
 
 from django.core.exceptions import FieldError
+from django.db import DatabaseError, connections, transaction
 
 pp = pprint.PrettyPrinter(indent=4)
 
@@ -158,3 +160,41 @@ def validate_values_names(qs, names):
         except FieldError as e:
             out[name] = {"ok": False, "kind": "invalid", "error": str(e)}
     return out
+
+
+def get_estimated_count(qs):
+    """
+    Return an estimation of qs.count() without counting the rows, or None.
+
+    Only PostgreSQL is supported : for unfiltered querysets, the planner
+    statistics of the table are used (pg_class.reltuples), for filtered ones,
+    the number of rows estimated by EXPLAIN is used.
+    Returns None if the database cannot give an estimation.
+    """
+    connection = connections[qs.db]
+    if connection.vendor != "postgresql":
+        return None
+    query = qs.query
+    try:
+        # a savepoint, so a failing estimation does not break the transaction
+        with transaction.atomic(using=qs.db), connection.cursor() as cursor:
+            if not query.where and not query.distinct and not query.combinator:
+                cursor.execute(
+                    "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                    [connection.ops.quote_name(qs.model._meta.db_table)],
+                )
+                row = cursor.fetchone()
+                estimation = row[0] if row else None
+            else:
+                sql, params = query.sql_with_params()
+                cursor.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+                plan = cursor.fetchone()[0]
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                estimation = plan[0]["Plan"]["Plan Rows"]
+    except (DatabaseError, LookupError, TypeError, ValueError):
+        return None
+    # reltuples is -1 on never analyzed tables
+    if estimation is None or estimation < 0:
+        return None
+    return int(estimation)
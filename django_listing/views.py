@@ -3,22 +3,30 @@
 #
 # @author: Eric Lapouyade
 #
+import threading
 import traceback
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
 from urllib.parse import parse_qs
 
+from asgiref.sync import sync_to_async
 from django import forms
+from django.conf import settings
 from django.contrib import messages
 from django.core.exceptions import PermissionDenied
 
-from django.db import models
+from django.db import connections, models
 from django.db.models import QuerySet
 from django.forms.models import construct_instance
 from django.http import (
+    FileResponse,
+    Http404,
     HttpResponse,
     HttpResponseRedirect,
     HttpResponseServerError,
     QueryDict,
     JsonResponse,
+    StreamingHttpResponse,
 )
 from django.template import RequestContext, loader
 from django.utils.module_loading import import_string
@@ -28,6 +36,8 @@ from django.utils.translation import gettext_lazy as _
 from django.views.generic import TemplateView
 
 from .exceptions import *
+from .export_jobs import EXPORT_JOB_QUERY_KEY, ExportJob
+from .instrumentation import listing_phase
 from .listing import Listing, logger
 from .attached_form import AttachedForm
 
@@ -36,6 +46,8 @@ __all__ = [
     "LISTING_REDIRECT_NONE",
     "LISTING_REDIRECT_NO_EDIT",
     "LISTING_REDIRECT_SAME_PAGE",
+    "AsyncListingView",
+    "AsyncListingViewMixin",
     "ListingView",
     "ListingViewMixin",
 ]
@@ -48,6 +60,49 @@ LISTING_REDIRECT_SAME_PAGE = 1
 LISTING_REDIRECT_NO_EDIT = 2
 
 
+listings_executor = None
+listings_executor_lock = threading.Lock()
+
+
+def get_listings_executor():
+    global listings_executor
+    with listings_executor_lock:
+        if listings_executor is None:
+            lsg_settings = settings.django_listing_settings
+            listings_executor = ThreadPoolExecutor(
+                max_workers=lsg_settings.CONCURRENT_LISTINGS_MAX_WORKERS,
+                thread_name_prefix="django_listing",
+            )
+    return listings_executor
+
+
+def prefetch_listing(listing):
+    try:
+        with ExitStack() as stack:
+            if listing.query_stats is not None and listing.query_stats.running:
+                # execute wrappers are per connection, so per thread
+                stack.enter_context(listing.query_stats.track_thread())
+            stack.enter_context(listing_phase(listing, "prefetch"))
+            listing.records.prefetch()
+    finally:
+        # close database connections opened by this thread
+        connections.close_all()
+
+
+class ExportJobFileResponse(FileResponse):
+    """Send a background export file, then remove it"""
+
+    def __init__(self, job, **kwargs):
+        self.job = job
+        super().__init__(
+            open(job.path, "rb"), as_attachment=True, filename=job.filename, **kwargs
+        )
+
+    def close(self):
+        super().close()
+        self.job.delete()
+
+
 class ListingViewMixin:
     listing_class = None
     listing_data = None
@@ -71,6 +126,8 @@ class ListingViewMixin:
         "as <tt>save_to_database=False</tt>."
     )
     is_ajax = False
+    async_render = False  # listings are rendered by AsyncListingViewMixin.get()
+    concurrent_listings = False  # fetch listings data in parallel threads
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
@@ -79,57 +136,91 @@ class ListingViewMixin:
         self.ajax_request_context = None
 
     def post(self, request, *args, **kwargs):
-        # make POST data mutable
-        request.POST = request.POST.copy()
-        if hasattr(self, "get_object"):  # for DetailView that works only on GET
-            self.object = self.get_object()
         try:
-            self.is_ajax = is_ajax(request)
-            if self.is_ajax:
-                try:
-                    if "serialized_data" in request.POST:
-                        serialized_data = request.POST.pop("serialized_data")
-                        if isinstance(serialized_data, list):
-                            serialized_data = serialized_data[0]
-                        data = parse_qs(serialized_data)
-                        for k, v in data.items():
-                            if k != "csrfmiddlewaretoken":
-                                if len(v) == 1:
-                                    request.POST[k] = v[0]
-                                else:
-                                    request.POST.setlist(k, v)
-                        # Manage checkbox cases on mass-op :
-                        # When checkbox is off : JS serialize do not transmit checkbox
-                        # input name, so create it...
-                        for k in data.keys():
-                            if k.endswith("_mass_op"):
-                                input_name = k[: -len("_mass_op")]
-                                if input_name not in request.POST:
-                                    request.POST[input_name] = ""
-
-                    return self.manage_listing_ajax_request(request, *args, **kwargs)
-                except KeyboardInterrupt:
-                    raise
-                except Exception as e:
-                    stack = traceback.format_exc()
-                    logger.error(stack)
-                    return HttpResponseServerError(e)
-            response = self.manage_listing_post(request, *args, **kwargs)
+            response = self.manage_post(request, *args, **kwargs)
             if response:
                 return response
             return self.get(request, *args, **kwargs)
         except ListingException as e:
             return HttpResponseServerError(str(e))
 
+    def manage_post(self, request, *args, **kwargs):
+        """Process the POST request, returns None if the page has to be rendered"""
+        # make POST data mutable
+        request.POST = request.POST.copy()
+        if hasattr(self, "get_object"):  # for DetailView that works only on GET
+            self.object = self.get_object()
+        self.is_ajax = is_ajax(request)
+        if self.is_ajax:
+            try:
+                if "serialized_data" in request.POST:
+                    serialized_data = request.POST.pop("serialized_data")
+                    if isinstance(serialized_data, list):
+                        serialized_data = serialized_data[0]
+                    data = parse_qs(serialized_data)
+                    for k, v in data.items():
+                        if k != "csrfmiddlewaretoken":
+                            if len(v) == 1:
+                                request.POST[k] = v[0]
+                            else:
+                                request.POST.setlist(k, v)
+                    # Manage checkbox cases on mass-op :
+                    # When checkbox is off : JS serialize do not transmit checkbox
+                    # input name, so create it...
+                    for k in data.keys():
+                        if k.endswith("_mass_op"):
+                            input_name = k[: -len("_mass_op")]
+                            if input_name not in request.POST:
+                                request.POST[input_name] = ""
+
+                return self.manage_listing_ajax_request(request, *args, **kwargs)
+            except KeyboardInterrupt:
+                raise
+            except Exception as e:
+                stack = traceback.format_exc()
+                logger.error(stack)
+                return HttpResponseServerError(e)
+        return self.manage_listing_post(request, *args, **kwargs)
+
     def get(self, request, *args, **kwargs):
-        response = super().get(request, *args, **kwargs)
-        # need to force rendering here to know whether a listing created
-        # in a template has requested a data export
-        response.render()
+        export_job_id = request.GET.get(EXPORT_JOB_QUERY_KEY)
+        if export_job_id:
+            return self.export_job_response(request, export_job_id)
+        try:
+            response = super().get(request, *args, **kwargs)
+            # need to force rendering here to know whether a listing created
+            # in a template has requested a data export
+            response.render()
+        finally:
+            self.stop_listings_instrumentation()
+        return self.get_export_response(request, response)
+
+    def stop_listings_instrumentation(self):
+        """Stop the tracking started by render_init_listings()
+
+        Listings rendered in the page template have already stopped it, not
+        the ones the template did not render.
+        """
+        for listing in self.yield_listing_instances():
+            listing.stop_instrumentation()
+
+    def get_export_response(self, request, response):
+        """Replace the page response by the export one if a listing exported data"""
         if hasattr(request, "export_data"):
             data = request.export_data
             filename = getattr(request, "export_filename", "listing")
-            response = HttpResponse(data)
+            if isinstance(data, ExportJob):
+                # No content : the browser stays on the page, javascript
+                # will poll the job status then download the file
+                response = HttpResponse(status=204)
+                response.set_cookie("file_generation", f"job-{data.id}")
+                return response
+            elif hasattr(request, "export_content_type"):
+                response = StreamingHttpResponse(
+                    data, content_type=request.export_content_type
+                )
+            else:
+                response = HttpResponse(data)
             response["Content-Disposition"] = 'attachment; filename="{}"'.format(
                 filename
             )
@@ -138,6 +229,20 @@ class ListingViewMixin:
             return response
         return response
 
+    def export_job_response(self, request, job_id):
+        job = ExportJob.get(job_id)
+        user = getattr(request, "user", None)
+        if job is None or job.user_id != getattr(user, "pk", None):
+            raise Http404("Export job not found")
+        if not request.GET.get("download"):
+            return self.json_response(job.get_status())
+        if job.status != "done":
+            raise Http404("Export file is not ready")
+        response = ExportJobFileResponse(job)
+        response.set_cookie("file_generation", "done")
+        response.set_cookie("last_file_generation_filename", job.filename)
+        return response
+
     def json_response(self, data, **kwargs):
         if hasattr(self, "listing_patch_json_response_data"):
             self.listing_patch_json_response_data(data)
@@ -209,10 +314,18 @@ class ListingViewMixin:
     def get_listing_context_name(self):
         return self.listing_context_name
 
+    @classmethod
+    def get_listing_params_keys(cls):
+        """Listing parameters keys, computed once per view class"""
+        keys = cls.__dict__.get("_listing_params_keys")
+        if keys is None:
+            keys = cls._listing_params_keys = list(Listing.get_params_keys()) + [
+                k for k in cls.__dict__ if "__" in k and not k.startswith("__")
+            ]  # add listing columns custimization keys (colname__attribute)
+        return keys
+
     def get_listing_params(self):
-        keys = list(Listing.get_params_keys()) + [
-            k for k in self.__class__.__dict__ if "__" in k and not k.startswith("__")
-        ]  # add listing columns custimization keys (colname__attribute)
+        keys = self.get_listing_params_keys()
         return {k: getattr(self, k) for k in keys if hasattr(self, k)}
 
     def get_listing_instance(self):
@@ -725,14 +838,46 @@ class ListingViewMixin:
                         )  # Ensure id is set according to method name + '-id'
                         self.set_to_listing_instances(listing_id, instance)
         self.get_default_listing_instance()  # will update self._listing_instances
+        listings = []
         for listing in self.yield_listing_instances():
             listing.request = self.request
             if listing.is_initialized() and not listing.is_render_initialized():
                 listing.set_view(self)
-                listing.render_init(RequestContext(self.request))
+                listings.append(listing)
+        if not self.async_render or self.concurrent_listings:
+            self.render_init_listings(listings)
 
         return self.listing_instances_context()
 
+    def render_init_listings(self, listings):
+        """render_init() view listings
+
+        With concurrent_listings, the queries of the listings current page
+        (count, rows, global aggregations) run in parallel threads, each
+        with its own database connection : they do not see uncommitted
+        changes of the request transaction.
+        """
+        for listing in listings:
+            listing.start_instrumentation(RequestContext(self.request))
+        if not self.concurrent_listings or len(listings) < 2:
+            for listing in listings:
+                listing.render_init(RequestContext(self.request))
+            return
+        for listing in listings:
+            listing.records.defer_page_records = True
+            try:
+                listing.render_init(RequestContext(self.request))
+            finally:
+                listing.records.defer_page_records = False
+        executor = get_listings_executor()
+        futures = [
+            executor.submit(prefetch_listing, listing)
+            for listing in listings
+            if listing.is_render_initialized()  # not exporting
+        ]
+        for future in futures:
+            future.result()
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context["request"] = self.request  # no need to add request context processor
@@ -748,3 +893,43 @@ class ListingViewMixin:
 
 class ListingView(ListingViewMixin, TemplateView):
     pass
+
+
+class AsyncListingViewMixin(ListingViewMixin):
+    """ListingViewMixin for ASGI
+
+    The view listings instances are rendered with Listing.arender() before the
+    page template, so their SQL queries use django async ORM. POST processing,
+    listings created in templates and ajax requests stay synchronous (in
+    sync_to_async()).
+    """
+
+    async_render = True
+
+    async def post(self, request, *args, **kwargs):
+        try:
+            response = await sync_to_async(self.manage_post)(request, *args, **kwargs)
+            if response:
+                return response
+            return await self.get(request, *args, **kwargs)
+        except ListingException as e:
+            return HttpResponseServerError(str(e))
+
+    async def get(self, request, *args, **kwargs):
+        export_job_id = request.GET.get(EXPORT_JOB_QUERY_KEY)
+        if export_job_id:
+            return await sync_to_async(self.export_job_response)(request, export_job_id)
+        try:
+            context = await sync_to_async(self.get_context_data)(**kwargs)
+            for listing in self.yield_listing_instances():
+                if listing.is_initialized() and not listing.is_render_initialized():
+                    await listing.arender(RequestContext(request))
+            response = self.render_to_response(context)
+            await sync_to_async(response.render)()
+        finally:
+            await sync_to_async(self.stop_listings_instrumentation)()
+        return self.get_export_response(request, response)
+
+
+class AsyncListingView(AsyncListingViewMixin, TemplateView):
+    pass